@@ -0,0 +1,85 @@
+"""Compares the directed cycle search of the MIPSOL callback on random dense incumbents.
+
+Run as ``python -m benchmarks.bench_find_cycles``. The reference is the former search over an edge list, which rescans
+all edges for the neighbors of every vertex on the stack; it is only timed up to ``REFERENCE_MAX_D`` vertices.
+"""
+import time
+
+import numpy as np
+
+from dagsolvers.solve_exmag import find_cycles
+
+REFERENCE_MAX_D = 200
+
+
+def find_cycles_edge_list(edges, mode):
+    vertices = set(e[0] for e in edges)
+    vertices.update(e[1] for e in edges)
+    visited = set()
+    on_stack = set()
+    parent = {}
+    stack = []
+    shortest_cycle = None
+    found_cycles = []
+    for root in vertices:
+        if root in visited:
+            continue
+        stack.append(root)
+        while stack:
+            v = stack[-1]
+            if v not in visited:
+                visited.add(v)
+                on_stack.add(v)
+            else:
+                if v in on_stack:
+                    on_stack.remove(v)
+                stack.pop()
+            neighbors = [e[1] for e in edges if e[0] == v]
+            for neighbor in neighbors:
+                if neighbor not in visited:
+                    stack.append(neighbor)
+                    parent[neighbor] = v
+                elif neighbor in on_stack:
+                    cycle = [neighbor, v]
+                    p = parent[v]
+                    while p != neighbor:
+                        cycle.append(p)
+                        p = parent[p]
+                    found_cycles.append(cycle)
+                    if shortest_cycle is None or len(shortest_cycle) > len(cycle):
+                        shortest_cycle = cycle
+    if mode == 'shortest_cycle':
+        return [shortest_cycle] if shortest_cycle is not None else []
+    return found_cycles
+
+
+def random_incumbent(d, density, seed=0):
+    # mostly acyclic incumbent with a few edges against the topological order
+    rng = np.random.default_rng(seed)
+    adj = np.triu(rng.random((d, d)) < density, k=1)
+    adj |= np.tril(rng.random((d, d)) < 0.02, k=-1)
+    return adj.astype(float)
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return 1000 * (time.perf_counter() - start), result
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"edges":>7} {"edge list [ms]":>15} {"shortest [ms]":>14} {"all [ms]":>10} '
+          f'{"disjoint [ms]":>14} {"#disjoint":>10} {"avg len":>8}')
+    for d in (20, 40, 60, 100, 200, 300):
+        adj = random_incumbent(d, density=0.3)
+        if d <= REFERENCE_MAX_D:
+            edges = list(zip(*np.nonzero(adj > 0.5)))
+            reference = f'{measure(find_cycles_edge_list, edges, "shortest_cycle")[0]:15.1f}'
+        else:
+            reference = f'{"-":>15}'
+        shortest_time, _ = measure(find_cycles, adj, 'shortest_cycle')
+        all_time, _ = measure(find_cycles, adj, 'all_cycles')
+        disjoint_time, disjoint = measure(find_cycles, adj, 'disjoint_cycles', 10)
+        average_length = np.mean([len(c) for c in disjoint]) if disjoint else 0
+        print(f'{d:>5} {int(adj.sum()):>7} {reference} {shortest_time:14.2f} {all_time:10.2f} '
+              f'{disjoint_time:14.2f} {len(disjoint):>10} {average_length:8.1f}')
@@ -0,0 +1,57 @@
+"""Compares the all-pairs shortest paths used by the MIPSOL separator.
+
+Run as ``python -m benchmarks.bench_floyd_warshall``. The reference is the former pure-Python triple loop; it is only
+timed up to ``REFERENCE_MAX_D`` vertices as it takes minutes beyond that.
+"""
+import time
+
+import numpy as np
+
+from dagsolvers.magseparation import floyd_warshall, transitive_closure
+
+REFERENCE_MAX_D = 100
+
+
+def floyd_warshall_loops(adj):
+    n = len(adj)
+    dist = np.full((n, n), np.inf)
+    dist[adj > 0.5] = 1
+    np.fill_diagonal(dist, 0)
+    for k in range(n):
+        for i in range(n):
+            for j in range(n):
+                pathlen = dist[i][k] + dist[k][j]
+                if dist[i][j] > pathlen:
+                    dist[i][j] = pathlen
+    return dist
+
+
+def random_incumbent(d, expected_degree=2.0, seed=0):
+    rng = np.random.default_rng(seed)
+    adj = (rng.random((d, d)) < expected_degree / d).astype(float)
+    np.fill_diagonal(adj, 0)
+    return adj
+
+
+def best_time(func, adj, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(adj)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"loops [ms]":>12} {"min-plus [ms]":>14} {"bitset closure [ms]":>20}')
+    for d in (10, 30, 60, 100, 200, 300):
+        adj = random_incumbent(d)
+        fw = floyd_warshall(adj)
+        assert (transitive_closure(adj) == np.isfinite(fw)).all()
+        if d <= REFERENCE_MAX_D:
+            assert (floyd_warshall_loops(adj) == fw).all()
+            loops = f'{1000 * best_time(floyd_warshall_loops, adj, repeat=1):12.1f}'
+        else:
+            loops = f'{"-":>12}'
+        print(f'{d:>5} {loops} {1000 * best_time(floyd_warshall, adj):14.2f} '
+              f'{1000 * best_time(transitive_closure, adj):20.2f}')
@@ -0,0 +1,44 @@
+"""Compares notears.utils.is_dag with the former igraph round trip.
+
+Run as ``python -m benchmarks.bench_is_dag``. Checks ``GRAPHS`` random weighted DAGs (with expected degree 4) of each
+size, given as dense arrays and as scipy.sparse CSR matrices, and reports the total time of each method.
+"""
+import time
+
+import igraph as ig
+import numpy as np
+import scipy.sparse as sp
+
+import notears.utils as utils
+
+GRAPHS = 200
+
+
+def is_dag_igraph(W):
+    return ig.Graph.Weighted_Adjacency(W.tolist()).is_dag()
+
+
+def random_dags(d, count, seed=0):
+    rng = np.random.default_rng(seed)
+    dags = []
+    for _ in range(count):
+        W = np.triu(rng.normal(size=(d, d)) * (rng.random((d, d)) < 4 / d), 1)
+        permutation = rng.permutation(d)
+        dags.append(W[np.ix_(permutation, permutation)])
+    return dags
+
+
+def total_time(func, graphs):
+    start = time.perf_counter()
+    results = [func(W) for W in graphs]
+    assert all(results)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"igraph [s]":>11} {"numpy [s]":>10} {"sparse [s]":>11}')
+    for d in (10, 50, 200, 500):
+        dags = random_dags(d, GRAPHS)
+        sparse_dags = [sp.csr_matrix(W) for W in dags]
+        print(f'{d:>5} {total_time(is_dag_igraph, dags):>11.4f} {total_time(utils.is_dag, dags):>10.4f} '
+              f'{total_time(utils.is_dag, sparse_dags):>11.4f}')
@@ -0,0 +1,44 @@
+"""Compares the exact l1 loss with the row-sampled and the iteratively reweighted (IRLS) approximations of solve().
+
+Run as ``python -m benchmarks.bench_l1_loss``. Solves instances with Gumbel noise simulated by notears.utils and
+reports the runtime, the exact l1 objective of the returned weights and the SHD of the directed edges (the exact model
+grows with n, so n is kept small).
+"""
+import contextlib
+import io
+import time
+
+import numpy as np
+
+import notears.utils as utils
+from dagsolvers.reweighting import l1_objective
+from dagsolvers.solve_exmag import solve
+
+LAMBDA1 = 1.0
+
+
+def run(X, l1_method):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        W, Wbi, *_ = solve(X, LAMBDA1, 'l1', 'l1', 0.0, l1_method=l1_method, l1_sample_size=len(X) // 4,
+                           mode='all_cycles', time_limit=120)
+    runtime = time.perf_counter() - start
+    return W, runtime, l1_objective(X, W + Wbi, W != 0, Wbi != 0, LAMBDA1, 'l1')
+
+
+if __name__ == '__main__':
+    methods = ('exact', 'sample', 'irls')
+    print(f'{"instance":>10} ' + ' '.join(f'{method + " [s]":>12} {method + " obj":>12} {method + " shd":>10}'
+                                          for method in methods))
+    for d, n in ((4, 200), (5, 100)):
+        for seed in range(3):
+            utils.set_random_seed(seed)
+            B_true = utils.simulate_dag(d, d, 'ER')
+            X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), n, 'gumbel')
+            line = f'{f"{d}x{n} {seed}":>10}'
+            for method in methods:
+                np.random.seed(seed)
+                W, runtime, objective = run(X, method)
+                shd = utils.count_accuracy(B_true != 0, (np.abs(W) > 0.3).astype(int))['shd']
+                line += f' {runtime:>12.3f} {objective:>12.4g} {shd:>10}'
+            print(line)
@@ -0,0 +1,48 @@
+"""Compares the minimal DAG threshold search of dagsolver_utils with the former linear walk over the weights.
+
+Run as ``python -m benchmarks.bench_minimal_dag_threshold``. The weight matrices are dense (every off-diagonal entry
+nonzero), so the threshold is close to the largest weights. The reference checks acyclicity once per distinct weight
+and is only timed up to ``REFERENCE_MAX_D`` variables.
+"""
+import time
+
+import numpy as np
+
+import notears.utils as notears_utils
+from dagsolvers.dagsolver_utils import find_minimal_dag_threshold
+
+REFERENCE_MAX_D = 60
+
+
+def find_minimal_dag_threshold_linear(W):
+    if notears_utils.is_dag(W):
+        return 0, W
+    possible_thresholds = sorted((abs(t) for t in W.flatten() if abs(t) > 0))
+    for t_candidate in possible_thresholds:
+        W[np.abs(W) < t_candidate] = 0
+        if notears_utils.is_dag(W):
+            return t_candidate, W
+    assert False  # Should always find a dag
+
+
+def dense_weights(d, seed=0):
+    rng = np.random.default_rng(seed)
+    W = rng.normal(size=(d, d))
+    np.fill_diagonal(W, 0)
+    return W
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"linear [s]":>11} {"binary search [s]":>18} {"same":>5}')
+    for d in (20, 60, 100, 300):
+        W = dense_weights(d)
+        start = time.perf_counter()
+        t, _ = find_minimal_dag_threshold(W)
+        search_time = time.perf_counter() - start
+        linear_time, same = float('nan'), ''
+        if d <= REFERENCE_MAX_D:
+            start = time.perf_counter()
+            t_linear, _ = find_minimal_dag_threshold_linear(W.copy())
+            linear_time = time.perf_counter() - start
+            same = str(t == t_linear)
+        print(f'{d:>5} {linear_time:>11.4f} {search_time:>18.4f} {same:>5}')
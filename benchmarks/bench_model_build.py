@@ -0,0 +1,50 @@
+"""Times the construction of the ExMAG model (variables, linking constraints and the l2 objective).
+
+Run as ``python -m benchmarks.bench_model_build``. The target is to build the whole model (structure and objective) for
+d=200 in under ``TARGET`` seconds; the last column reports by how much a size exceeds it.
+"""
+import time
+
+import gurobipy as gp
+import numpy as np
+from gurobipy import GRB
+
+from dagsolvers.solve_exmag import add_mag_variables, l2_loss_matrices
+
+TARGET = 1.0
+
+
+def time_build(d, n=1000, tabu_ratio=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, d))
+    tabu_matrix = np.triu(rng.random((d, d)) < tabu_ratio, k=1)
+    tabu_matrix = (tabu_matrix | tabu_matrix.T).astype(int)
+
+    m = gp.Model()
+    start = time.perf_counter()
+    edges_vars, biedges_vars, edges_weights = add_mag_variables(m, d, tabu_matrix)
+    m.update()
+    structure_time = time.perf_counter() - start
+
+    # the same objective as build_model with an l2 loss and l1 regularization, see set_objective
+    start = time.perf_counter()
+    quad, lin, constant = l2_loss_matrices(X.T @ X, d, tabu_matrix == 0, n)
+    w = edges_weights.reshape(-1)
+    m.setMObjective(quad, lin, constant, w, w, w, GRB.MINIMIZE)
+    edges_vars.Obj = np.ones((d, d))
+    biedges_vars.Obj = np.ones((d, d))
+    m.update()
+    objective_time = time.perf_counter() - start
+    num_vars, num_constrs = m.NumVars, m.NumConstrs
+    m.dispose()
+    return structure_time, objective_time, num_vars, num_constrs
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"vars":>8} {"constrs":>8} {"structure [s]":>14} {"objective [s]":>14} {"total [s]":>10} '
+          f'{"over target [s]":>16}')
+    for d in (25, 50, 100, 200):
+        structure_time, objective_time, num_vars, num_constrs = time_build(d)
+        total = structure_time + objective_time
+        print(f'{d:>5} {num_vars:>8} {num_constrs:>8} {structure_time:>14.3f} {objective_time:>14.3f} {total:>10.3f} '
+              f'{max(total - TARGET, 0):>16.3f}')
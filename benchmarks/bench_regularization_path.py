@@ -0,0 +1,41 @@
+"""Compares a lambda1 grid solved by independent solve() calls with solve_path on one shared model.
+
+Run as ``python -m benchmarks.bench_regularization_path``.
+"""
+import contextlib
+import io
+import time
+
+import numpy as np
+
+import notears.utils as utils
+from dagsolvers.regularization_path import solve_path
+from dagsolvers.solve_exmag import solve
+
+
+def simulate(d=8, n=500, s0=16, tabu_ratio=0.3, seed=0):
+    utils.set_random_seed(seed)
+    B_true = utils.simulate_dag(d, s0, 'ER')
+    X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), n, 'gauss')
+    tabu_edges = [(i, j) for i in range(d) for j in range(i)
+                  if B_true[i, j] == 0 and B_true[j, i] == 0 and np.random.rand() < tabu_ratio]
+    return X, tabu_edges
+
+
+if __name__ == '__main__':
+    X, tabu_edges = simulate()
+    lambdas = np.geomspace(2.0, 0.02, 20)
+    options = {'tabu_edges': tabu_edges, 'mode': 'all_cycles', 'time_limit': 60}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        independent = [solve(X, lambda1, 'l2', 'l1', 0, **options) for lambda1 in lambdas]
+        independent_time = time.perf_counter() - start
+        start = time.perf_counter()
+        path = solve_path(X, lambdas, 'l2', 'l1', 0, **options)
+        path_time = time.perf_counter() - start
+
+    print(f'{"lambda1":>8} {"lazy (indep.)":>14} {"lazy (path)":>12} {"runtime (path) [s]":>19}')
+    for lambda1, (_, _, _, lazy_independent, _), (_, _, _, runtime, lazy_path) in zip(lambdas, independent, path):
+        print(f'{lambda1:8.3f} {lazy_independent:>14} {lazy_path:>12} {runtime:19.3f}')
+    print(f'independent solves: {independent_time:.2f}s, path: {path_time:.2f}s')
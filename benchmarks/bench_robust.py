@@ -0,0 +1,55 @@
+"""Compares the exact robust mode of build_model with the trimmed least squares of solve(robust='trimmed').
+
+Run as ``python -m benchmarks.bench_robust``. Solves instances simulated by notears.utils with a tenth of the rows
+replaced by outliers and reports the runtime, the trimmed l2 objective (the loss over the best 90% of the rows plus the
+regularization) and the SHD of the directed edges. The exact mode, limited to 30 seconds, is run only for tiny n.
+"""
+import contextlib
+import io
+import time
+
+import numpy as np
+
+import notears.utils as utils
+from dagsolvers.solve_exmag import solve
+
+LAMBDA1 = 10.0
+FRACTION = 0.9
+
+
+def simulate(d, n, seed):
+    utils.set_random_seed(seed)
+    B_true = utils.simulate_dag(d, d, 'ER')
+    X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), n, 'gauss')
+    outliers = np.random.choice(n, size=n // 10, replace=False)
+    X[outliers] = np.random.normal(scale=20.0, size=(len(outliers), d))
+    return X, B_true
+
+
+def run(X, robust):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        W, Wbi, *_ = solve(X, LAMBDA1, 'l2', 'l1', 0.0, robust=robust, robust_fraction=FRACTION, mode='all_cycles',
+                           time_limit=30)
+    runtime = time.perf_counter() - start
+    squared_residuals = np.sort(((X - X @ (W + Wbi)) ** 2).sum(axis=1))
+    edges = np.count_nonzero(W) + np.count_nonzero(Wbi)
+    objective = squared_residuals[:round(FRACTION * len(X))].sum() + LAMBDA1 / X.shape[1] * edges
+    return W, runtime, objective
+
+
+if __name__ == '__main__':
+    print(f'{"instance":>12} {"exact [s]":>10} {"exact obj":>10} {"exact shd":>10} {"trimmed [s]":>12} '
+          f'{"trimmed obj":>12} {"trimmed shd":>12}')
+    for d, n in ((4, 10), (4, 20), (5, 2000), (8, 20000)):
+        for seed in range(2):
+            X, B_true = simulate(d, n, seed)
+            line = f'{f"{d}x{n} {seed}":>12}'
+            for robust, width in ((True, 10), ('trimmed', 12)):
+                if robust is True and n > 20:
+                    line += f' {"-":>{width}} {"-":>{width}} {"-":>{width}}'
+                    continue
+                W, runtime, objective = run(X, robust)
+                shd = utils.count_accuracy(B_true != 0, (np.abs(W) > 0.3).astype(int))['shd']
+                line += f' {runtime:>{width}.3f} {objective:>{width}.4g} {shd:>{width}}'
+            print(line)
@@ -0,0 +1,37 @@
+"""Compares the full ExMAG model with the models restricted to a candidate super-structure from screening.
+
+Run as ``python -m benchmarks.bench_screening``. Reports the number of edge variables left free and the constraints,
+the objective value and the runtime of each model.
+"""
+import contextlib
+import io
+
+import numpy as np
+
+from benchmarks.bench_regularization_path import simulate
+from dagsolvers.solve_exmag import build_model, optimize_model
+
+
+def run(X, tabu_edges, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        m = build_model(X, 0.1, 'l2', 'l1', tabu_edges=tabu_edges, mode='all_cycles', time_limit=60, **options)
+        m.Params.MIPGap = 1e-4
+        optimize_model(m)
+    free = int(np.sum(m._edges_vars.ub) + np.sum(m._biedges_vars.ub))
+    result = free, m.NumConstrs, m.ObjVal, m.Runtime
+    m.dispose()
+    return result
+
+
+if __name__ == '__main__':
+    X, tabu_edges = simulate(d=8, n=1000, s0=10)
+    print(f'{"screening":>24} {"free edge vars":>15} {"constrs":>8} {"objective":>10} {"runtime [s]":>12}')
+    full_objective = None
+    for name, options in [('full', {}),
+                          ('partial correlation k=4', {'candidates': 'partial_correlation', 'screening_k': 4}),
+                          ('partial correlation k=2', {'candidates': 'partial_correlation', 'screening_k': 2}),
+                          ('correlation > 0.2', {'candidates': 'correlation', 'screening_threshold': 0.2})]:
+        free, constrs, objective, runtime = run(X, tabu_edges, **options)
+        full_objective = objective if full_objective is None else full_objective
+        print(f'{name:>24} {free:>15} {constrs:>8} {objective:>10.5f} {runtime:>12.3f}'
+              f'  ({100 * (objective / full_objective - 1):+.2f}% vs full)')
@@ -0,0 +1,60 @@
+"""Compares the structural Hamming distance of dagsolver_utils with the former pair-by-pair loop.
+
+Run as ``python -m benchmarks.bench_shd``. Scores ``BATCH`` random CPDAG estimates against one truth one by one with
+the loop and with calculate_dag_shd, and all at once with calculate_dag_shd_batch.
+"""
+import time
+
+import numpy as np
+
+from dagsolvers.dagsolver_utils import calculate_dag_shd, calculate_dag_shd_batch
+
+BATCH = 20
+
+
+def calculate_dag_shd_loops(B_true, B_est):
+    shd = 0
+    for i in range(B_true.shape[0]):
+        for j in range(i):
+            e_ij = (B_est[i, j], B_est[j, i])
+            if min(e_ij) == -1:
+                e_ij = (-1, -1)
+            t_ij = (B_true[i, j], B_true[j, i])
+            if min(t_ij) == -1:
+                t_ij = (-1, -1)
+            if e_ij != t_ij:
+                if e_ij == t_ij[::-1]:
+                    shd += 0.5
+                elif (e_ij == (-1, -1) and t_ij == (0, 0)) or (e_ij == (0, 0) and t_ij == (-1, -1)):
+                    shd += 1
+                elif e_ij == (-1, -1) or t_ij == (-1, -1):
+                    shd += 0.5
+                else:
+                    shd += 1
+    return shd
+
+
+def random_cpdag(rng, d, expected_degree=4.0):
+    """Upper triangular (hence acyclic) adjacency with a fifth of the edges undirected (-1 in one direction)."""
+    B = np.triu(rng.random((d, d)) < expected_degree / d, 1).astype(int)
+    B[(B == 1) & (rng.random((d, d)) < 0.2)] = -1
+    return B
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"loops [s]":>10} {"vectorized [s]":>15} {"batch [s]":>10} {"same":>5}')
+    rng = np.random.default_rng(0)
+    for d in (20, 100, 500):
+        B_true = random_cpdag(rng, d)
+        B_ests = np.array([random_cpdag(rng, d) for _ in range(BATCH)])
+        start = time.perf_counter()
+        loops = [calculate_dag_shd_loops(B_true, B_est) for B_est in B_ests]
+        loops_time = time.perf_counter() - start
+        start = time.perf_counter()
+        vectorized = [calculate_dag_shd(B_true, B_est) for B_est in B_ests]
+        vectorized_time = time.perf_counter() - start
+        start = time.perf_counter()
+        batch = calculate_dag_shd_batch(B_true, B_ests)
+        batch_time = time.perf_counter() - start
+        same = loops == vectorized == batch.tolist()
+        print(f'{d:>5} {loops_time:>10.4f} {vectorized_time:>15.4f} {batch_time:>10.4f} {str(same):>5}')
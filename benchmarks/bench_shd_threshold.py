@@ -0,0 +1,54 @@
+"""Compares the SHD-optimal threshold search called from the solver callback.
+
+Run as ``python -m benchmarks.bench_shd_threshold``. The reference is the former loop that thresholds the estimate and
+calls calculate_shd for each distinct weight; it is only timed up to ``REFERENCE_MAX_D`` variables as it is O(d^4).
+"""
+import time
+
+import numpy as np
+
+import notears.utils as utils
+from dagsolvers.dagsolver_utils import apply_threshold, calculate_shd, find_optimal_threshold_for_shd
+
+REFERENCE_MAX_D = 40
+
+
+def find_optimal_threshold_for_shd_loops(B_true, W_est, A_true, A_est, W_bi_true, W_bi_est):
+    possible_thresholds = set((abs(t) for t in W_est.flatten() if abs(t) > 0)) or [0]
+    best_t = max(possible_thresholds)
+    best_shd = B_true.shape[0] ** 2
+    B_all_true = B_true - (W_bi_true != 0)
+    for t_candidate in possible_thresholds:
+        B_all_est_t = (apply_threshold(W_est, t_candidate) != 0) + (-1 * (apply_threshold(W_bi_est, t_candidate) != 0))
+        shd, _, _ = calculate_shd(B_all_true, B_all_est_t, A_true, A_est)
+        if shd < best_shd:
+            best_t = t_candidate
+            best_shd = shd
+    return best_t, best_shd
+
+
+def random_problem(d, seed=0):
+    """True DAG and an estimate with its weights plus small spurious edges consistent with its topological order."""
+    utils.set_random_seed(seed)
+    B_true = utils.simulate_dag(d, 2 * d, 'ER').astype(int)
+    position = np.argsort(utils.topological_order(B_true))
+    spurious = np.random.normal(scale=0.2, size=(d, d)) * (np.random.rand(d, d) < 4 / d)
+    W_est = utils.simulate_parameter(B_true) + spurious * (position[:, None] < position[None, :])
+    return B_true, W_est
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"loops [s]":>10} {"sweep [s]":>10} {"same":>5}')
+    for d in (10, 20, 40, 100, 500):
+        B_true, W_est = random_problem(d)
+        zeros = np.zeros((d, d))
+        start = time.perf_counter()
+        result = find_optimal_threshold_for_shd(B_true, W_est, [], [], zeros, zeros)
+        sweep_time = time.perf_counter() - start
+        loops_time, same = float('nan'), ''
+        if d <= REFERENCE_MAX_D:
+            start = time.perf_counter()
+            reference = find_optimal_threshold_for_shd_loops(B_true, W_est, [], [], zeros, zeros)
+            loops_time = time.perf_counter() - start
+            same = str(reference[1] == result[1])
+        print(f'{d:>5} {loops_time:>10.4f} {sweep_time:>10.4f} {same:>5}')
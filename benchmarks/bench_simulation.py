@@ -0,0 +1,34 @@
+"""Compares simulating replicates with simulate_linear_sem one by one and with simulate_linear_sem_batch.
+
+Run as ``python -m benchmarks.bench_simulation``. Simulates ``REPLICATES`` data sets of an ER DAG with expected degree 4
+for each size and noise type and reports the total time of each method.
+"""
+import time
+
+import notears.utils as utils
+
+REPLICATES = 20
+
+
+def loop(W, n, sem_type):
+    return [utils.simulate_linear_sem(W, n, sem_type) for _ in range(REPLICATES)]
+
+
+def batch(W, n, sem_type):
+    return utils.simulate_linear_sem_batch(W, n, sem_type, REPLICATES, seed=0)
+
+
+def total_time(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print(f'{"d":>5} {"n":>7} {"sem":>9} {"loop [s]":>9} {"batch [s]":>10}')
+    for d, n in ((20, 1000), (100, 1000), (500, 1000), (100, 20000)):
+        utils.set_random_seed(0)
+        W = utils.simulate_parameter(utils.simulate_dag(d, 2 * d, 'ER'))
+        for sem_type in ('gauss', 'logistic'):
+            print(f'{d:>5} {n:>7} {sem_type:>9} {total_time(loop, W, n, sem_type):>9.3f} '
+                  f'{total_time(batch, W, n, sem_type):>10.3f}')
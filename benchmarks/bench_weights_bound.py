@@ -0,0 +1,44 @@
+"""Compares the global weights_bound with the data-driven per-edge bounds of screening.weight_bounds.
+
+Run as ``python -m benchmarks.bench_weights_bound``. Solves standardized ER and SF instances simulated by
+notears.utils and reports the explored nodes and the time to reach the MIP gap of build_model (or the gap left after
+the time limit).
+"""
+import contextlib
+import io
+
+import numpy as np
+
+import notears.utils as utils
+from dagsolvers.solve_exmag import build_model, optimize_model
+
+
+def simulate(d, graph_type, seed, n=500, tabu_ratio=0.3):
+    utils.set_random_seed(seed)
+    B_true = utils.simulate_dag(d, 2 * d, graph_type)
+    X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), n, 'gauss')
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+    tabu_edges = [(i, j) for i in range(d) for j in range(i)
+                  if B_true[i, j] == 0 and B_true[j, i] == 0 and np.random.rand() < tabu_ratio]
+    return X, tabu_edges
+
+
+def run(X, tabu_edges, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        m = build_model(X, 0.5, 'l2', 'l1', tabu_edges=tabu_edges, mode='all_cycles', time_limit=30, **options)
+        optimize_model(m)
+    result = m.NodeCount, m.Runtime, m.MIPGap
+    m.dispose()
+    return result
+
+
+if __name__ == '__main__':
+    print(f'{"instance":>10} {"nodes (100)":>12} {"nodes (data)":>13} {"time (100) [s]":>15} {"time (data) [s]":>16}'
+          f' {"gap (100)":>10} {"gap (data)":>11}')
+    for graph_type in ('ER', 'SF'):
+        for seed in range(3):
+            X, tabu_edges = simulate(8, graph_type, seed)
+            nodes, runtime, gap = run(X, tabu_edges)
+            data_nodes, data_runtime, data_gap = run(X, tabu_edges, data_weights_bound=True)
+            print(f'{graph_type + " " + str(seed):>10} {nodes:>12.0f} {data_nodes:>13.0f} {runtime:>15.3f} '
+                  f'{data_runtime:>16.3f} {gap:>10.3f} {data_gap:>11.3f}')
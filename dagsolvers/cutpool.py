@@ -0,0 +1,86 @@
+import itertools
+import json
+
+import gurobipy as gp
+
+
+def edges_sum(var_matrix, edges):
+    """Linear expression summing the entries of the (d, d) MVar var_matrix at positions given by edges."""
+    return gp.quicksum(var_matrix[i, j].item() for i, j in edges)
+
+
+def cut_expression(edges_vars, biedges_vars, directed_edges, bidirected_edges):
+    """Returns (lhs, rhs) of the cut stating that not all the given directed and bidirected edges are selected."""
+    lhs = edges_sum(edges_vars, directed_edges) + edges_sum(biedges_vars, bidirected_edges)
+    return lhs, len(directed_edges) + len(bidirected_edges) - 1
+
+
+class CutPool:
+    """Set of cuts (directed edges, bidirected edges) learned by the callback of one or more solves over d variables.
+
+    A cut is identified by its set of directed edges and its set of unordered bidirected pairs, as the bidirected edge
+    variables are symmetric. The pool can be saved to and loaded from JSON and its cuts added to a later model over
+    the same variables.
+    """
+
+    def __init__(self, d, cuts=()):
+        self.d = d
+        self._cuts = {}
+        for directed_edges, bidirected_edges in cuts:
+            self.add(directed_edges, bidirected_edges)
+
+    @staticmethod
+    def key(directed_edges, bidirected_edges):
+        return frozenset(directed_edges), frozenset((min(u, v), max(u, v)) for u, v in bidirected_edges)
+
+    def add(self, directed_edges, bidirected_edges):
+        """Adds the cut, returns False if it is already in the pool."""
+        directed_edges = [(int(u), int(v)) for u, v in directed_edges]
+        bidirected_edges = [(int(u), int(v)) for u, v in bidirected_edges]
+        key = self.key(directed_edges, bidirected_edges)
+        if key in self._cuts:
+            return False
+        self._cuts[key] = (directed_edges, bidirected_edges)
+        return True
+
+    def __contains__(self, cut):
+        directed_edges, bidirected_edges = cut
+        return self.key(map(tuple, directed_edges), map(tuple, bidirected_edges)) in self._cuts
+
+    def __len__(self):
+        return len(self._cuts)
+
+    def __iter__(self):
+        return iter(self._cuts.values())
+
+    def add_constraints(self, model, edges_vars, biedges_vars, lazy=0, start=0):
+        """Adds the cuts (from the start-th one in the order they were added to the pool) to the model, as ordinary
+        constraints if lazy is 0, otherwise with the given Lazy attribute value (1, 2 or 3, see the Gurobi
+        documentation).
+
+        The cuts over an edge the model excludes (with upper bound 0, e.g., a bidirected edge outside the tabu
+        edges) always hold and are skipped; with compact bidirected variables, such a pair need not have a variable at
+        all."""
+        assert lazy in (0, 1, 2, 3), f'Invalid lazy value {lazy}'
+        model.update()
+        directed_ub, bidirected_ub = edges_vars.ub, biedges_vars.ub
+        constrs = []
+        for directed_edges, bidirected_edges in itertools.islice(self, start, None):
+            if any(directed_ub[u, v] == 0 for u, v in directed_edges) or \
+                    any(bidirected_ub[u, v] == 0 for u, v in bidirected_edges):
+                continue
+            lhs, rhs = cut_expression(edges_vars, biedges_vars, directed_edges, bidirected_edges)
+            constrs.append(model.addLConstr(lhs, gp.GRB.LESS_EQUAL, rhs))
+        if lazy and constrs:
+            model.setAttr('Lazy', constrs, [lazy] * len(constrs))
+        return constrs
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'d': self.d, 'cuts': [[directed, bidirected] for directed, bidirected in self]}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['d'], data['cuts'])
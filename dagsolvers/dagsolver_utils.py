@@ -12,46 +12,123 @@ def apply_threshold(W, w_threshold):
 
 
 def find_minimal_dag_threshold(W):
+    """Smallest threshold t such that W with the entries below t in absolute value removed is a DAG (0 if W is one,
+    otherwise one of its absolute weights), together with that thresholded copy of W; W itself is not modified.
+
+    Removing edges keeps a DAG acyclic, so acyclicity is monotone in t and a binary search over the sorted distinct
+    absolute weights needs O(log d) acyclicity checks instead of one per weight.
+    """
     if notears_utils.is_dag(W):
-        return 0, W
-    possible_thresholds = sorted((abs(t) for t in W.flatten() if abs(t) > 0))
-    for t_candidate in possible_thresholds:
-        W[np.abs(W) < t_candidate] = 0
-        if notears_utils.is_dag(W):
-            return t_candidate, W
-    assert False  # Should always find a dag
-
-
-def find_optimal_threshold_for_shd(B_true, W_est, A_true, A_est, W_bi_true, W_bi_est):
-    values = set((abs(t) for t in W_est.flatten() if abs(t) > 0))
-    for A_i_est in A_est:
-        values.update((abs(t) for t in A_i_est.flatten() if abs(t) > 0))
-
-    possible_thresholds = values #sorted((abs(t) for t in W_est.flatten() if abs(t) > 0))
-    if not possible_thresholds:
-        possible_thresholds = [0]
-
-    best_t = max(possible_thresholds) if possible_thresholds else 0
-    best_shd = B_true.shape[0] ** 2 # calculate_shd(W_true, W_est != 0, A_true, A_est) # W_true.shape[0]**2
-    B_bi_true = W_bi_true != 0
-    B_all_true = B_true - B_bi_true
-    for t_candidate in possible_thresholds:
-        W_est_t = apply_threshold(W_est, t_candidate)
-        A_est_t = [apply_threshold(A_i_est, t_candidate) for A_i_est in A_est]
-        W_bi_est_t = apply_threshold(W_bi_est, t_candidate)
-        B_bi_est_t = (W_bi_est_t != 0)
-        B_est_t = W_est_t != 0
-        B_all_est_t = B_est_t + (-1 * B_bi_est_t) # CPDAG - undirected edges have -1
-        shd, _, _ = calculate_shd(B_all_true, B_all_est_t, A_true, A_est_t)
-
-        if shd < best_shd:
-            best_t = t_candidate
-            best_shd = shd
+        return 0, np.copy(W)
+    thresholds = np.unique(np.abs(W[W != 0]))
+    low, high = 0, len(thresholds) - 1
+    assert notears_utils.is_dag(apply_threshold(W, thresholds[high]))  # Should always find a dag
+    while low < high:
+        middle = (low + high) // 2
+        if notears_utils.is_dag(apply_threshold(W, thresholds[middle])):
+            high = middle
+        else:
+            low = middle + 1
+    return thresholds[low], apply_threshold(W, thresholds[low])
+
+
+# states of a pair (B[i, j], B[j, i]), i > j, with -1 marking an undirected (CPDAG) or bidirected (MAG) edge
+PAIR_NONE, PAIR_FORWARD, PAIR_BACKWARD, PAIR_BOTH, PAIR_UNDIRECTED = range(5)
+_PAIR_STATES = ((0, 0), (1, 0), (0, 1), (1, 1), (-1, -1))
+
+
+def _pair_state_shd(e_ij, t_ij):
+    if e_ij == t_ij:
+        return 0.0
+    if e_ij == t_ij[::-1]:
+        return 0.5
+    if (e_ij == (-1, -1) and t_ij == (0, 0)) or (e_ij == (0, 0) and t_ij == (-1, -1)):
+        return 1.0
+    if e_ij == (-1, -1) or t_ij == (-1, -1):
+        return 0.5
+    return 1.0
+
+
+# SHD contribution of a pair, indexed by the estimated and the true pair state
+PAIR_SHD = np.array([[_pair_state_shd(e_ij, t_ij) for t_ij in _PAIR_STATES] for e_ij in _PAIR_STATES])
+
+
+def pair_codes(a, b):
+    """Pair states (see PAIR_SHD) of the pairs with entries a = B[i, j] and b = B[j, i]."""
+    return np.where((a == -1) | (b == -1), PAIR_UNDIRECTED, (a != 0) * PAIR_FORWARD + (b != 0) * PAIR_BACKWARD)
+
+
+def adjacency_pair_codes(B):
+    """Pair states of the pairs i > j of a (..., d, d) stack of adjacency matrices, shape (..., d * (d - 1) / 2)."""
+    lower, upper = np.tril_indices(B.shape[-1], -1)
+    return pair_codes(B[..., lower, upper], B[..., upper, lower])
+
+
+def _shd_sweep(thresholds, B_true, W_est, W_bi_est=None):
+    """SHD of the estimate thresholded at each of the sorted thresholds (entries below the threshold removed) against
+    B_true with entries in {0, 1, -1}, summed over the pairs i > j as in calculate_dag_shd.
+
+    Each pair changes its contribution only when one of its (at most four) entries drops out, so the contributions
+    are evaluated once per drop and accumulated over the thresholds by a cumulative sum.
+    """
+    lower, upper = np.tril_indices(B_true.shape[0], -1)
+    entries = [W_est[lower, upper], W_est[upper, lower]]
+    if W_bi_est is not None:
+        entries += [W_bi_est[lower, upper], W_bi_est[upper, lower]]
+    values = np.abs(np.column_stack(entries))
+    # index of the first threshold at which the entry is removed, 0 for the entries that are never present
+    removals = np.where(values != 0, np.searchsorted(thresholds, values, side='right'), 0)
+    true_codes = adjacency_pair_codes(B_true)
+
+    def contributions(k):
+        present = removals > k[:, np.newaxis]
+        e_a, e_b = present[:, 0].astype(int), present[:, 1].astype(int)
+        if W_bi_est is not None:
+            e_a = e_a - present[:, 2]
+            e_b = e_b - present[:, 3]
+        return PAIR_SHD[pair_codes(e_a, e_b), true_codes]
+
+    changes = np.zeros(len(thresholds) + 1)
+    previous = contributions(np.zeros(len(lower), dtype=int))
+    base = previous.sum()
+    for k in np.sort(removals, axis=1).T:
+        current = contributions(k)
+        changes += np.bincount(k, weights=current - previous, minlength=len(changes))
+        previous = current
+    # changes at index 0 are already in base, those past the last threshold never apply
+    changes[0] = 0
+    return base + np.cumsum(changes[:len(thresholds)])
+
+
+def find_optimal_threshold_for_shd(B_true, W_est, A_true, A_est, W_bi_true, W_bi_est, return_curve=False):
+    """Threshold minimizing the SHD of the estimate (W_est with the bidirected edges W_bi_est and the lagged A_est)
+    over the distinct nonzero absolute weights of W_est and A_est, together with the minimal SHD.
+
+    The candidate thresholds are sorted once and swept with the SHD updated as the entries drop out (see _shd_sweep),
+    in O(d^2 log d) instead of a calculate_shd call per candidate. Ties are resolved towards the smallest threshold. The
+    thresholded estimates are not validated (calculate_shd checks that they are DAGs). With return_curve, also
+    returns the sorted candidate thresholds and the SHD at each of them.
+    """
+    values = [np.abs(W_est[W_est != 0])] + [np.abs(A_i_est[A_i_est != 0]) for A_i_est in A_est]
+    thresholds = np.unique(np.concatenate(values))
+    if len(thresholds) == 0:
+        thresholds = np.zeros(1)
+
+    B_all_true = (np.asarray(B_true) != 0).astype(int) - (W_bi_true != 0)
+    curve = _shd_sweep(thresholds, B_all_true, W_est, W_bi_est)
+    for A_i_true, A_i_est in zip(A_true, A_est):
+        curve = curve + _shd_sweep(thresholds, (A_i_true != 0).astype(int), A_i_est)
+
+    best_t, best_shd = thresholds.max(), B_true.shape[0] ** 2
+    best = np.argmin(curve)
+    if curve[best] < best_shd:
+        best_t, best_shd = thresholds[best], curve[best]
+    if return_curve:
+        return best_t, best_shd, (thresholds, curve)
     return best_t, best_shd
 
 
-def calculate_dag_shd(B_true, B_est, test_dag=True):
-    assert B_true.shape == B_est.shape
+def _check_estimate(B_est, test_dag):
     if (B_est == -1).any():  # cpdag
         if not ((B_est == 0) | (B_est == 1) | (B_est == -1)).all():
             raise ValueError('B_est should take value in {0,1,-1}')
@@ -63,27 +140,23 @@ def calculate_dag_shd(B_true, B_est, test_dag=True):
         if test_dag and not notears_utils.is_dag(B_est):
             raise ValueError('B_est should be a DAG')
 
-    shd = 0
-    for i in range(B_true.shape[0]):
-        for j in range(i):
-            e_ij = (B_est[i,j], B_est[j,i])
-            if min(e_ij) == -1:
-                e_ij = (-1,-1)
-            t_ij = (B_true[i,j], B_true[j,i])
-            if min(t_ij) == -1:
-                t_ij = (-1,-1)
-
-            if e_ij != t_ij:
-                if e_ij == t_ij[::-1]:
-                    shd += 0.5
-                elif (e_ij == (-1,-1) and t_ij == (0,0)) or (e_ij == (0,0) and t_ij == (-1,-1)):
-                    shd += 1
-                elif e_ij == (-1, -1) or t_ij == (-1, -1):
-                    shd += 0.5
-                else:
-                    shd += 1
-
-    return shd
+
+def calculate_dag_shd(B_true, B_est, test_dag=True):
+    """SHD of the DAG, CPDAG or MAG B_est (-1 for undirected or bidirected edges) to B_true: 1 for a missing, extra
+    or (between directed and undirected) mismatched edge, 0.5 for a reversed edge and for an undirected edge in place
+    of a directed one or vice versa."""
+    assert B_true.shape == B_est.shape
+    _check_estimate(B_est, test_dag)
+    return float(PAIR_SHD[adjacency_pair_codes(B_est), adjacency_pair_codes(B_true)].sum())
+
+
+def calculate_dag_shd_batch(B_true, B_ests, test_dag=True):
+    """calculate_dag_shd of each of the (k, d, d) estimates B_ests to B_true, as an array of k SHDs."""
+    B_ests = np.asarray(B_ests)
+    assert B_ests.shape[1:] == B_true.shape
+    for B_est in B_ests:
+        _check_estimate(B_est, test_dag)
+    return PAIR_SHD[adjacency_pair_codes(B_ests), adjacency_pair_codes(B_true)].sum(axis=-1)
 
 
 def calculate_shd(B_true, B_est, A_true, A_est, test_dag=True):
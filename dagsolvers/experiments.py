@@ -0,0 +1,153 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import notears.utils as utils
+from dagsolvers.solve_exmag import solve
+
+DEFAULT_GRID = {
+    'd': [8],
+    'n': [1000],
+    'edge_ratio': [2],
+    'graph_type': ['ER'],
+    'sem_type': ['gauss'],
+    'hidden_ratio': [0.2],
+    'tabu_ratio': [0.2],
+    'lambda1': [0.1],
+    'seed': [0, 1, 2],
+}
+
+
+def expand_grid(grid):
+    """List of configurations, one for each combination of the values in grid (a dict of lists, values missing in
+    grid are taken from DEFAULT_GRID)."""
+    grid = {**DEFAULT_GRID, **grid}
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def simulate_problem(d, n, edge_ratio, graph_type, sem_type, hidden_ratio, tabu_ratio, seed):
+    """Simulates a linear SEM over d variables, hides a hidden_ratio fraction of them and marks a tabu_ratio fraction
+    of the non-adjacent observed pairs as tabu, as in the example in solve_exmag. Returns the observed data, the true
+    weighted adjacency matrix over the observed variables and the tabu edges."""
+    utils.set_random_seed(seed)
+    B_true = utils.simulate_dag(d, int(edge_ratio * d), graph_type)
+    W_true = utils.simulate_parameter(B_true)
+    X = utils.simulate_linear_sem(W_true, n, sem_type, noise_scale=1)
+
+    observed = np.sort(np.random.choice(range(d), size=int(d * (1 - hidden_ratio)), replace=False))
+    X = X[:, observed]
+    W_true = W_true[np.ix_(observed, observed)]
+    tabu_edges = []
+    for i in range(len(observed)):
+        for j in range(i):
+            if W_true[i, j] == 0.0 and W_true[j, i] == 0.0 and np.random.rand() < tabu_ratio:
+                tabu_edges.append((i, j))
+    return X, W_true, tabu_edges
+
+
+def run_experiment(config, threads=None, w_threshold=0.1, solve_options=None):
+    """Simulates the problem given by config, solves it and returns config extended by the results. The solver output
+    is suppressed; an exception is reported in the 'error' field of the result."""
+    result = dict(config)
+    start = time.perf_counter()
+    try:
+        problem = {key: value for key, value in config.items() if key != 'lambda1'}
+        X, W_true, tabu_edges = simulate_problem(**problem)
+        with contextlib.redirect_stdout(io.StringIO()):
+            W_est, W_bi, gap, lazy_count, _ = solve(X, config['lambda1'], 'l2', 'l1', w_threshold,
+                                                    tabu_edges=tabu_edges, threads=threads, **(solve_options or {}))
+        result.update(utils.count_accuracy(W_true != 0, (W_est != 0).astype(int)))
+        result.update({'bidirected': int(np.count_nonzero(W_bi)) // 2, 'gap': gap, 'lazy_count': lazy_count})
+    except Exception as e:
+        result['error'] = repr(e)
+    result['runtime'] = time.perf_counter() - start
+    return result
+
+
+class JsonLinesWriter:
+    """Appends each result as one JSON line to the file at path, flushing after every result."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def write(self, result):
+        self.file.write(json.dumps(result, default=float) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class MlflowWriter:
+    """Logs each result as one mlflow run, with the configuration as parameters and the results as metrics."""
+
+    def __init__(self, tracking_uri, experiment_name='exmag'):
+        import mlflow
+        self.mlflow = mlflow
+        mlflow.set_tracking_uri(tracking_uri)
+        mlflow.set_experiment(experiment_name)
+
+    def write(self, result):
+        with self.mlflow.start_run():
+            self.mlflow.log_params({key: value for key, value in result.items() if key in DEFAULT_GRID})
+            if 'error' in result:
+                self.mlflow.set_tag('error', result['error'])
+            self.mlflow.log_metrics({key: float(value) for key, value in result.items()
+                                     if key not in DEFAULT_GRID and key != 'error'})
+
+    def close(self):
+        pass
+
+
+def run_grid(grid, writers, workers=None, threads=None, w_threshold=0.1, solve_options=None):
+    """Runs all configurations of grid in a pool of worker processes and writes each result to all writers as soon
+    as it is available. Unless given, threads (of Gurobi per worker) is chosen so that workers * threads does not
+    exceed the number of cores. Returns the list of results in the order of completion."""
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    threads = threads or max(1, cores // workers)
+    configs = expand_grid(grid)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_experiment, config, threads, w_threshold, solve_options) for config in configs]
+        for future in as_completed(futures):
+            result = future.result()
+            for writer in writers:
+                writer.write(result)
+            results.append(result)
+            print(f'{len(results)}/{len(configs)} done: shd {result.get("shd")}, runtime {result["runtime"]:.2f}s'
+                  + (f', error {result["error"]}' if 'error' in result else ''))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs ExMAG on a grid of simulated problems in parallel.')
+    parser.add_argument('--grid', help='JSON file with a dict of lists of values, see DEFAULT_GRID')
+    parser.add_argument('--results', default='results.jsonl', help='JSON lines file the results are appended to')
+    parser.add_argument('--mlflow', help='also log the results to mlflow with this tracking URI, e.g., file:./mlruns')
+    parser.add_argument('--workers', type=int, help='number of worker processes (default: number of cores)')
+    parser.add_argument('--threads', type=int, help='Gurobi threads per worker (default: cores / workers)')
+    parser.add_argument('--time-limit', type=float, default=300, help='time limit of one solve in seconds')
+    args = parser.parse_args()
+
+    grid = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    writers = [JsonLinesWriter(args.results)]
+    if args.mlflow:
+        writers.append(MlflowWriter(args.mlflow))
+    try:
+        run_grid(grid, writers, args.workers, args.threads,
+                 solve_options={'mode': 'all_cycles', 'time_limit': args.time_limit})
+    finally:
+        for writer in writers:
+            writer.close()
@@ -0,0 +1,138 @@
+import numpy as np
+
+from dagsolvers.magseparation import floyd_warshall, check_for_inducing_path
+
+
+class ColumnRegressions:
+    """Least squares regressions of every column j on its parents given by the Gram matrix, updated one parent at a
+    time.
+
+    The partial covariances of all the columns given the parents P_j of j are gram - Q_j^T Q_j, where the rows of Q_j
+    are the rows of the Cholesky factor of gram restricted to P_j (in the order the parents were added), so adding a
+    parent appends one row in O(d |P_j|) time instead of solving the regression again. gains[k, j] is the decrease of
+    the residual sum of squares of column j when k is added to its parents: the squared partial covariance of k and j
+    over the partial variance of k.
+    """
+
+    def __init__(self, gram):
+        d = len(gram)
+        self.gram = gram
+        self.parents = np.zeros((d, d), dtype=bool)
+        self.factors = [np.zeros((0, d)) for _ in range(d)]
+        self.covariances = gram.copy()
+        self.variances = np.tile(np.diag(gram)[:, None], (1, d))
+        self.tolerance = 1e-12 * max(np.max(np.diag(gram)), 1.0)
+        self.gains = np.zeros((d, d))
+        for j in range(d):
+            self._update_gains(j)
+
+    @property
+    def residuals(self):
+        """Residual sums of squares of the columns."""
+        return np.diag(self.covariances).copy()
+
+    def add_parent(self, k, j):
+        self.parents[k, j] = True
+        if self.variances[k, j] > self.tolerance:  # otherwise, k is a linear combination of the parents already
+            factor = self.factors[j]
+            row = (self.gram[k] - factor[:, k] @ factor) / np.sqrt(self.variances[k, j])
+            self.factors[j] = np.vstack([factor, row])
+            self.covariances[:, j] -= row * row[j]
+            self.variances[:, j] -= row ** 2
+        self._update_gains(j)
+
+    def _update_gains(self, j):
+        variances = self.variances[:, j]
+        gains = np.where(variances > self.tolerance,
+                         self.covariances[:, j] ** 2 / np.maximum(variances, self.tolerance), 0.0)
+        gains[self.parents[:, j]] = 0
+        gains[j] = 0
+        self.gains[:, j] = gains
+
+
+def fit_weights(gram, support, n, lambda1=0.0, reg_type='l1'):
+    """Least squares (ridge for the l2 regularization) weights of each column j on the columns support[:, j]."""
+    d = len(gram)
+    ridge = n * lambda1 / d if reg_type == 'l2' else 0.0
+    W = np.zeros((d, d))
+    for j in range(d):
+        parents = np.flatnonzero(support[:, j])
+        if len(parents):
+            W[parents, j] = np.linalg.pinv(gram[np.ix_(parents, parents)] + ridge * np.eye(len(parents))) @ \
+                gram[parents, j]
+    return W
+
+
+def l2_objective(gram, n, W, edges, biedges, lambda1, reg_type):
+    """Value of the l2 objective of solve() for the given solution."""
+    d = len(gram)
+    loss = np.trace(gram) - 2 * np.sum(gram * W) + np.sum(W * (gram @ W))
+    if reg_type == 'l2':
+        reg = np.sum(W ** 2)
+    else:
+        reg = np.sum(edges) + np.sum(biedges)
+    return loss / n + lambda1 * reg / d
+
+
+def greedy_mag(gram, n, tabu_matrix, lambda1=0.0, reg_type='l1', candidates=None, min_gain=0.01, max_parents=None):
+    """Greedy construction of a MAG from the Gram matrix X^T X of n samples.
+
+    First, directed edges outside of the tabu matrix are added one by one, each time the one that decreases the
+    residual sum of squares the most while keeping the graph acyclic, as long as the decrease (divided by n) exceeds the
+    l1 penalty lambda1 / d and the decrease is at least min_gain times the current residual sum of squares of its
+    column; with max_parents, a column gets at most that many parents. Then, in the same way, bidirected edges are
+    added between tabu pairs that are not connected by a directed path, rejecting those that would create an inducing
+    path. With a candidates matrix, the edges are restricted as in solve_exmag.allowed_edges. Returns the directed and
+    (symmetric) bidirected adjacency matrices, the least squares weights and the objective value.
+
+    The regressions are updated incrementally (see ColumnRegressions), so each added edge costs O(d^2) time and the
+    whole construction O(d^2 * edges), e.g., 0.2-0.4 s for d=200, n=1000 and 400 true edges. The bidirected stage
+    additionally searches for an inducing path per candidate pair.
+    """
+    d = len(gram)
+    tabu_matrix = np.asarray(tabu_matrix, dtype=bool)
+    penalty = n * lambda1 / d if reg_type == 'l1' else 0.0
+    max_parents = d if max_parents is None else max_parents
+    edges = np.zeros((d, d), dtype=bool)
+    biedges = np.zeros((d, d), dtype=bool)
+    reach = np.eye(d, dtype=bool)
+    regressions = ColumnRegressions(gram)
+
+    candidates = np.ones((d, d), dtype=bool) if candidates is None else np.asarray(candidates, dtype=bool)
+    allowed = ~tabu_matrix & candidates & ~np.eye(d, dtype=bool)
+    while True:
+        gains = regressions.gains
+        open_columns = edges.sum(axis=0) < max_parents
+        eligible = allowed & ~edges & ~reach.T & open_columns & (gains > penalty) & \
+            (gains >= min_gain * regressions.residuals)
+        edge_gains = np.where(eligible, gains, 0.0)
+        k, j = np.unravel_index(np.argmax(edge_gains), edge_gains.shape)
+        if edge_gains[k, j] <= 0:
+            break
+        edges[k, j] = True
+        reach |= np.outer(reach[:, k], reach[j, :])
+        regressions.add_parent(k, j)
+
+    support = edges.copy()
+    rejected = ~np.triu(tabu_matrix, k=1) | ~(candidates | candidates.T) | reach | reach.T
+    fwdist = floyd_warshall(edges)
+    while True:
+        gains, residuals = regressions.gains, regressions.residuals
+        pair_gains = gains + gains.T
+        eligible = ~rejected & (pair_gains > 2 * penalty) & \
+            (pair_gains >= min_gain * (residuals[:, None] + residuals[None, :]))
+        pair_gains = np.where(eligible, pair_gains, 0.0)
+        u, v = np.unravel_index(np.argmax(pair_gains), pair_gains.shape)
+        if pair_gains[u, v] <= 0:
+            break
+        rejected[u, v] = True
+        biedges[u, v] = biedges[v, u] = True
+        if check_for_inducing_path(edges, biedges, fwdist, max_paths=1):
+            biedges[u, v] = biedges[v, u] = False
+            continue
+        support[u, v] = support[v, u] = True
+        regressions.add_parent(v, u)
+        regressions.add_parent(u, v)
+
+    W = fit_weights(gram, support, n, lambda1, reg_type)
+    return edges.astype(int), biedges.astype(int), W, l2_objective(gram, n, W, edges, biedges, lambda1, reg_type)
@@ -1,7 +1,11 @@
+import time
+from collections import deque
+
 import numpy as np
 
 
 def floyd_warshall(adj):
+    adj = np.asarray(adj)
     n = len(adj)
     dist = np.full((n, n), np.inf)
 
@@ -9,98 +13,269 @@ def floyd_warshall(adj):
     dist[adj > 0.5] = 1
     np.fill_diagonal(dist, 0)
 
-    for k in range(n):  # k is the midpoint of SP
-        for i in range(n):
-            for j in range(n):
-                pathlen = dist[i][k] + dist[k][j]
-                if dist[i][j] > pathlen:
-                    dist[i][j] = pathlen
+    for k in range(n):  # k is the midpoint of SP, relax all pairs at once by the row-broadcast min-plus product
+        np.minimum(dist, dist[:, k, np.newaxis] + dist[np.newaxis, k, :], out=dist)
 
     return dist
 
 
-def trace_f_w(dist, adj, u, v):
-    if dist[u][v] == np.inf:
-        return []
+def transitive_closure(adj):
+    """Boolean reachability matrix (reflexive), i.e., np.isfinite(floyd_warshall(adj)).
 
-    n = len(dist)
-    marked = np.full((n, n), False)
-    edges = []
-    if adj[u][v] == 1:
-        edges.append((u, v))
-    stack = []
-    marked[u, v] = True
-    stack.append((u, v))
-
-    while stack:
-        i, j = stack.pop()
-        for k in range(n):
-            if dist[i][k] + dist[k][j] != np.inf:  # a path goes through k
-                for s, t in [(i, k), (k, j)]:
-                    if not marked[s][t]:  # make sure not to include duplicates
-                        marked[s][t] = True
-                        if adj[s][t] == 1:  # direct edge, add it to the list
-                            edges.append((s, t))
-                        stack.append((s, t))  # a path, recurse
-    return edges
+    The rows are kept packed to bits, so each of the n steps is an OR of packed row k into the rows that reach k.
+    """
+    adj = np.asarray(adj)
+    n = len(adj)
+    reach = adj > 0.5
+    np.fill_diagonal(reach, True)
+    packed = np.packbits(reach, axis=1)
+    for k in range(n):
+        reaches_k = ((packed[:, k >> 3] >> (7 - (k & 7))) & 1).astype(bool)
+        packed[reaches_k] |= packed[k]
+    return np.unpackbits(packed, axis=1, count=n).astype(bool)
 
 
-def inducing_path_dfs(dist, adj, s, u, possible_endpoints, path, only_one_dir=True):
-    # dist = FW distances, adj = bidirect adjacency, u curr point, s where we started, path = current path
-    if len(possible_endpoints) == 0:  # no possible enpoint, how can an inducing path exist?
-        return []
+def bfs_distances(adj, sources):
+    """Rows of floyd_warshall(adj) for the given sources, computed by a level-synchronous multi-source BFS."""
+    n = len(adj)
+    adj = np.asarray(adj) > 0.5
+    dist = np.full((len(sources), n), np.inf)
+    frontier = np.zeros((len(sources), n), dtype=bool)
+    frontier[np.arange(len(sources)), sources] = True
+    visited = frontier.copy()
+    # float32 counts the predecessors exactly (up to 2^24) and uses BLAS, uint8 would wrap around at 256
+    adj = adj.astype(np.float32)
+    level = 0
+    while frontier.any():
+        dist[frontier] = level
+        level += 1
+        frontier = (frontier.astype(np.float32) @ adj > 0) & ~visited
+        visited |= frontier
+    return dist
 
-    paths = []
-    # we need to test for endpoint of the inducing path
-    if len(path) > 2:
-        if u in possible_endpoints:
-            if u < s or not only_one_dir:  # optimization - report only one direction
-                paths.append(path)
 
-    # nest further
-    n = len(dist)
-    for v in range(n):
-        if adj[u][v] > 0.5:  # iterate neighbors
-            if v not in path:  # make sure we do not cycle or use edge we came from
-                v_endpoints = possible_endpoints if dist[v][s] != np.inf \
-                    else possible_endpoints & set(np.where(dist[v][:] < np.inf)[0])  # exists a path to v?
-                paths_after_v = inducing_path_dfs(dist, adj, s, v, v_endpoints, path + [v])
-                paths.extend(paths_after_v)
+class ReachabilityCache:
+    """Keeps the all-pairs distances of the last processed incumbent and updates them for the next one.
+
+    Successive incumbents in the MIPSOL callback usually differ in a few edges only. An inserted edge (a, b) is handled
+    by the min-plus update dist = min(dist, dist[:, a] + 1 + dist[b, :]), a deleted edge by recomputing with BFS only
+    the rows of sources that have some shortest path through it. If more than max_changes edges differ, the distances
+    are recomputed from scratch by floyd_warshall.
+    """
 
-    return paths
+    def __init__(self, max_changes=10):
+        self.max_changes = max_changes
+        self._adj = None
+        self._dist = None
+        self.hits = 0
+        self.misses = 0
+        self.incremental_time = 0.0
+        self.full_time = 0.0
 
+    def distances(self, adj):
+        """Returns the same matrix as floyd_warshall(adj); the result must not be modified by the caller."""
+        start = time.perf_counter()
+        adj = np.asarray(adj) > 0.5
+        changed = self._adj is not None and np.count_nonzero(adj != self._adj) <= self.max_changes
+        if changed:
+            self._dist = self._update(adj)
+            self.hits += 1
+            self.incremental_time += time.perf_counter() - start
+        else:
+            self._dist = floyd_warshall(adj)
+            self.misses += 1
+            self.full_time += time.perf_counter() - start
+        self._adj = adj
+        return self._dist
+
+    def _update(self, adj):
+        dist = self._dist.copy()
+        deleted = list(zip(*np.nonzero(self._adj & ~adj)))
+        inserted = list(zip(*np.nonzero(adj & ~self._adj)))
+        if deleted:
+            affected = np.zeros(len(adj), dtype=bool)
+            for a, b in deleted:
+                affected |= np.isfinite(dist[:, b]) & (dist[:, a] + 1 == dist[:, b])
+            sources = np.flatnonzero(affected)
+            if len(sources):
+                dist[sources] = bfs_distances(adj & self._adj, sources)
+        for a, b in inserted:
+            np.minimum(dist, dist[:, a, np.newaxis] + 1 + dist[np.newaxis, b, :], out=dist)
+        return dist
+
+    def statistics(self):
+        calls = self.hits + self.misses
+        average_full = self.full_time / self.misses if self.misses else 0.0
+        return {
+            'calls': calls,
+            'hits': self.hits,
+            'hit_rate': self.hits / calls if calls else 0.0,
+            'incremental_time': self.incremental_time,
+            'full_time': self.full_time,
+            # estimated by the average full recompute time
+            'time_saved': self.hits * average_full - self.incremental_time,
+        }
+
+
+class AncestorEdgeIndex:
+    """Answers which directed edges lie on a directed path between two sets of vertices.
+
+    An edge (s, t) of adj lies on some u -> v path iff u reaches s and t reaches v, so the edges of all paths from
+    sources to targets are adj & desc(sources) x anc(targets), where desc and anc are unions of rows and columns of the
+    reachability matrix derived once from the Floyd-Warshall distances.
+    """
+
+    def __init__(self, dist, adj):
+        self.reach = np.isfinite(dist)
+        self.adj = np.asarray(adj) > 0.5
+
+    def edges(self, sources, targets):
+        descendants = self.reach[sources, :].reshape(-1, len(self.reach)).any(axis=0)
+        ancestors = self.reach[:, targets].reshape(len(self.reach), -1).any(axis=1)
+        mask = self.adj & descendants[:, np.newaxis] & ancestors[np.newaxis, :]
+        return list(zip(*(idx.tolist() for idx in np.nonzero(mask))))
+
+
+def trace_f_w(dist, adj, u, v):
+    """Directed edges of adj that lie on some path from u to v."""
+    return AncestorEdgeIndex(dist, adj).edges(u, v)
 
-def inducing_paths(dist, adjbi):
-    paths = []
+
+def iter_inducing_paths(dist, adjbi, max_length=None, shortest_first=False):
+    """Yields the inducing paths of the bidirected graph adjbi as lists of vertices.
+
+    A simple bidirected path s, ..., t with at least three vertices is reported if every interior vertex is an ancestor
+    of s or t; only the direction with t < s is reported. The search keeps an explicit stack (or a queue if
+    shortest_first), each state storing its parent state, a visited bitmask and the bitmask of endpoints that are still
+    possible, so no path is copied until it is yielded. max_length bounds the number of bidirected edges of a path;
+    with it set, longer inducing paths are not found.
+    """
     n = len(dist)
-    for v in range(n):
-        paths.extend(inducing_path_dfs(dist, adjbi, v, v, set(range(n)), [v]))
-    return paths
+    reach = np.isfinite(dist)
+    is_ancestor = reach.tolist()
+    descendants = [int.from_bytes(np.packbits(row, bitorder='little').tobytes(), 'little') for row in reach]
+    neighbors = [np.flatnonzero(np.asarray(adjbi[u]) > 0.5).tolist() for u in range(n)]
+    all_vertices = (1 << n) - 1
+
+    # state = (vertex, parent state, number of vertices on the path, visited bitmask, possible endpoints bitmask)
+    states = deque()
+    for s in range(n):
+        states.append(((s, None, 1, 1 << s, all_vertices), s))
+    pop = states.popleft if shortest_first else states.pop
+    while states:
+        state, s = pop()
+        u, _, length, visited, endpoints = state
+        if length > 2 and endpoints >> u & 1 and u < s:
+            path, node = [], state
+            while node is not None:
+                path.append(node[0])
+                node = node[1]
+            yield path[::-1]
+        if max_length is not None and length > max_length:
+            continue
+        for v in neighbors[u]:
+            if visited >> v & 1:  # make sure we do not cycle or use edge we came from
+                continue
+            v_endpoints = endpoints if is_ancestor[v][s] else endpoints & descendants[v]  # exists a path to v?
+            if v_endpoints:  # no possible endpoint, no inducing path can exist
+                states.append(((v, state, length + 1, visited | 1 << v, v_endpoints), s))
+
+
+def inducing_paths(dist, adjbi, max_length=None, shortest_first=False):
+    return list(iter_inducing_paths(dist, adjbi, max_length=max_length, shortest_first=shortest_first))
 
 
-def check_for_inducing_path(adj, adjbi, fwdist):
-    #fwdist = floyd_warshall(adj)
-    paths = inducing_paths(fwdist, adjbi)
+def check_for_inducing_path(adj, adjbi, fwdist, max_length=None, max_paths=None, shortest_first=False, index=None):
+    """Returns the cuts (directed edges, bidirected edges) of the inducing paths, at most max_paths of them.
+
+    The directed part of a cut are the edges on paths from the interior vertices to the endpoints. Paths that lead to
+    the same cut are reported only once. An AncestorEdgeIndex of adj and fwdist can be shared through index.
+    """
+    if index is None:
+        index = AncestorEdgeIndex(fwdist, adj)
     retval = []  # list of tuples of lists (directed, bidirected)
-    for path in paths:
+    seen = set()
+    for path in iter_inducing_paths(fwdist, adjbi, max_length=max_length, shortest_first=shortest_first):
         s = path[0]
         t = path[-1]
         biedges = [(path[i], path[i + 1]) for i in range(len(path) - 1)]
-        diredges = []
-        for v in path[1:-1]:
-            diredges.extend(trace_f_w(fwdist, adj, v, s))
-            diredges.extend(trace_f_w(fwdist, adj, v, t))
+        diredges = index.edges(path[1:-1], [s, t])
+        key = (frozenset(diredges), frozenset((min(e), max(e)) for e in biedges))
+        if key in seen:
+            continue
+        seen.add(key)
         retval.append((diredges, biedges))
+        if max_paths is not None and len(retval) >= max_paths:
+            break
     return retval
 
 
-def check_for_almost_directed_cycles(adj, adjbi, fwdist):
+def check_for_almost_directed_cycles(adj, adjbi, fwdist, index=None):
     # we look over all bi-directed edges and check whether there is path from one endpoint to the other
-    n = len(adj)
+    if index is None:
+        index = AncestorEdgeIndex(fwdist, adj)
     retval = []
-    for u in range(n):
-        for v in range(n):  # no need to check the other direction as the adjbi is symmetric -> both uv an vu are tested
-            if adjbi[u][v] and fwdist[u][v] != np.inf:  # biedge uv and path uv
-                diredges = trace_f_w(fwdist, adj, u, v)
-                retval.append((diredges, [(u, v)]))
+    # no need to check the other direction as the adjbi is symmetric -> both uv an vu are tested
+    for u, v in zip(*np.nonzero((np.asarray(adjbi) > 0.5) & np.isfinite(fwdist))):  # biedge uv and path uv
+        retval.append((index.edges(u, v), [(int(u), int(v))]))
     return retval
+
+
+def weighted_floyd_warshall(weights):
+    """Shortest paths for nonnegative edge weights (inf = no edge); returns distances and the successor matrix, where
+    succ[i, j] is the vertex following i on a shortest i -> j path."""
+    n = len(weights)
+    dist = np.array(weights, dtype=float)
+    np.fill_diagonal(dist, 0)
+    succ = np.tile(np.arange(n), (n, 1))
+    for k in range(n):
+        through_k = dist[:, k, np.newaxis] + dist[np.newaxis, k, :]
+        better = through_k < dist
+        dist[better] = through_k[better]
+        succ[better] = np.broadcast_to(succ[:, k, np.newaxis], (n, n))[better]
+    return dist, succ
+
+
+def _shortest_path_edges(succ, u, v):
+    edges = []
+    while u != v:
+        edges.append((u, int(succ[u, v])))
+        u = int(succ[u, v])
+    return edges
+
+
+def separate_fractional_cycles(x, xbi, tol=1e-3, max_cuts=20, eps=1e-6):
+    """Separates the cycle and almost directed cycle inequalities for a fractional point of the LP relaxation.
+
+    A cycle inequality sum_{e in C} x_e <= |C| - 1 reads sum_{e in C} (1 - x_e) >= 1, so the most violated one is a
+    shortest cycle with edge weights 1 - x_e. Similarly, a path P from u to v together with a bidirected edge uv
+    violates sum_{e in P} x_e + xbi_uv <= |P| iff the weight of P plus 1 - xbi_uv is below 1. Edges with x_e <= eps
+    cannot be part of a violated inequality and are ignored. Returns the lists of the violated cycle cuts (directed
+    edges) and almost directed cycle cuts (directed edges, bidirected edges), most violated first.
+    """
+    x = np.asarray(x)
+    weights = np.where(x > eps, np.maximum(1 - x, 0), np.inf)
+    np.fill_diagonal(weights, np.inf)
+    dist, succ = weighted_floyd_warshall(weights)
+
+    cycle_cuts = []
+    seen = set()
+    cycle_weight = weights + dist.T  # edge u -> v closed by a shortest path v -> u
+    candidates = np.argwhere(cycle_weight < 1 - tol)
+    for u, v in sorted(candidates.tolist(), key=lambda e: cycle_weight[e[0], e[1]]):
+        edges = [(u, v)] + _shortest_path_edges(succ, v, u)
+        key = frozenset(edges)
+        if key not in seen:
+            seen.add(key)
+            cycle_cuts.append(edges)
+            if len(cycle_cuts) >= max_cuts:
+                break
+
+    almost_directed_cuts = []
+    xbi = np.asarray(xbi)
+    almost_weight = dist + np.where(xbi > eps, 1 - xbi, np.inf)
+    np.fill_diagonal(almost_weight, np.inf)
+    candidates = np.argwhere(almost_weight < 1 - tol)
+    for u, v in sorted(candidates.tolist(), key=lambda e: almost_weight[e[0], e[1]])[:max_cuts]:
+        almost_directed_cuts.append((_shortest_path_edges(succ, u, v), [(u, v)]))
+    return cycle_cuts, almost_directed_cuts
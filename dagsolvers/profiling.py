@@ -0,0 +1,127 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from gurobipy import GRB
+
+CUT_KINDS = ('cycle', 'almost_directed_cycle', 'inducing_path', 'user_cycle', 'user_almost_directed_cycle')
+CALLBACK_NAMES = {GRB.Callback.MIP: 'mip', GRB.Callback.MIPSOL: 'mipsol', GRB.Callback.MIPNODE: 'mipnode'}
+
+
+class CallbackProfiler:
+    """Instrumentation of check_for_mag during one optimization of a model from build_model.
+
+    Collects the wall time and number of calls of the callback (by where) and of its stages, the number and sizes
+    (number of edges) of the cuts found of each kind in CUT_KINDS and the trajectory of the incumbent objective and
+    the bound. record() returns all of it as a JSON serializable dict.
+    """
+
+    def __init__(self):
+        self.callback_calls = defaultdict(int)
+        self.callback_time = defaultdict(float)
+        self.stage_calls = defaultdict(int)
+        self.stage_time = defaultdict(float)
+        self.cut_counts = dict.fromkeys(CUT_KINDS, 0)
+        self.cut_sizes = dict.fromkeys(CUT_KINDS, 0)
+        self.cut_max_sizes = dict.fromkeys(CUT_KINDS, 0)
+        self.trajectory = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_time[name] += time.perf_counter() - start
+            self.stage_calls[name] += 1
+
+    def callback(self, where, elapsed):
+        name = CALLBACK_NAMES.get(where, 'other')
+        self.callback_calls[name] += 1
+        self.callback_time[name] += elapsed
+
+    def cuts(self, kind, cuts):
+        """Counts the cuts of the given kind, each a list of edges or a pair (directed edges, bidirected edges)."""
+        for cut in cuts:
+            size = len(cut[0]) + len(cut[1]) if isinstance(cut, tuple) else len(cut)
+            self.cut_counts[kind] += 1
+            self.cut_sizes[kind] += size
+            self.cut_max_sizes[kind] = max(self.cut_max_sizes[kind], size)
+
+    def bounds(self, runtime, incumbent, bound):
+        """Appends the point to the trajectory if the incumbent objective or the bound changed."""
+        if not self.trajectory or self.trajectory[-1][1:] != [incumbent, bound]:
+            self.trajectory.append([runtime, incumbent, bound])
+
+    def record(self, model=None):
+        """The collected statistics, with the runtime, node count, gap and lazy constraint counts of model if given.
+        gurobi_time is the runtime not spent in the callback."""
+        callback_time = sum(self.callback_time.values())
+        record = {
+            'callback_time': callback_time,
+            'callbacks': {name: {'calls': self.callback_calls[name], 'time': self.callback_time[name]}
+                          for name in self.callback_calls},
+            'stages': {name: {'calls': self.stage_calls[name], 'time': self.stage_time[name]}
+                       for name in self.stage_calls},
+            'cuts': {kind: {'count': self.cut_counts[kind], 'total_size': self.cut_sizes[kind],
+                            'max_size': self.cut_max_sizes[kind]} for kind in CUT_KINDS},
+            'trajectory': [list(point) for point in self.trajectory],
+        }
+        if model is not None:
+            record.update({'runtime': model.Runtime, 'gurobi_time': model.Runtime - callback_time,
+                           'node_count': model.NodeCount, 'gap': model.MIPGap,
+                           'lazy_constraints': model._lazy_count, 'suppressed_cuts': model._suppressed_cuts})
+        return record
+
+
+def merge_records(records):
+    """Combines the records of several optimizations: the times and counts are summed, the maximal cut sizes and the
+    gap maximized and the trajectories concatenated as if the optimizations ran one after another."""
+    merged = {'callback_time': 0.0, 'callbacks': {}, 'stages': {}, 'cuts': {}, 'trajectory': []}
+    offset = 0.0
+    for record in records:
+        merged['callback_time'] += record['callback_time']
+        for key in ('callbacks', 'stages'):
+            for name, values in record[key].items():
+                totals = merged[key].setdefault(name, {'calls': 0, 'time': 0.0})
+                totals['calls'] += values['calls']
+                totals['time'] += values['time']
+        for kind, values in record['cuts'].items():
+            totals = merged['cuts'].setdefault(kind, {'count': 0, 'total_size': 0, 'max_size': 0})
+            totals['count'] += values['count']
+            totals['total_size'] += values['total_size']
+            totals['max_size'] = max(totals['max_size'], values['max_size'])
+        merged['trajectory'].extend([offset + runtime, incumbent, bound]
+                                    for runtime, incumbent, bound in record['trajectory'])
+        if 'runtime' in record:
+            offset += record['runtime']
+            for key in ('runtime', 'gurobi_time', 'node_count', 'lazy_constraints', 'suppressed_cuts'):
+                merged[key] = merged.get(key, 0) + record[key]
+            merged['gap'] = max(merged.get('gap', 0.0), record['gap'])
+    return merged
+
+
+def write_json(record, path):
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=2, default=float)
+
+
+def log_mlflow(record, tracking_uri, experiment_name='exmag', run_name=None):
+    """Logs a record as one mlflow run: the totals and stage times as metrics, the trajectory as the stepped metrics
+    incumbent and bound, and the whole record as the artifact profile.json. Requires mlflow."""
+    import mlflow
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment_name)
+    with mlflow.start_run(run_name=run_name):
+        metrics = {key: float(record[key]) for key in ('runtime', 'gurobi_time', 'callback_time', 'node_count', 'gap',
+                                                       'lazy_constraints', 'suppressed_cuts') if key in record}
+        metrics.update({f'stage_{name}_time': values['time'] for name, values in record['stages'].items()})
+        metrics.update({f'cuts_{kind}': values['count'] for kind, values in record['cuts'].items()})
+        mlflow.log_metrics(metrics)
+        for step, (_, incumbent, bound) in enumerate(record['trajectory']):
+            # Gurobi reports GRB.INFINITY before the first incumbent
+            if abs(incumbent) < GRB.INFINITY:
+                mlflow.log_metric('incumbent', incumbent, step=step)
+            mlflow.log_metric('bound', bound, step=step)
+        mlflow.log_dict(record, 'profile.json')
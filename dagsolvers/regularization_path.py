@@ -0,0 +1,32 @@
+import gurobipy as gp
+
+from dagsolvers.solve_exmag import build_model, set_lambda, optimize_model, extract_solution, add_pool_cuts
+
+
+def solve_path(X, lambdas, loss_type, reg_type, w_threshold, path_cuts_lazy=0, **kwargs):
+    """Solves the ExMAG problem for every lambda1 in lambdas on a single model.
+
+    The model is built once (see build_model for the keyword arguments) and the lambdas are processed in increasing
+    order, so the denser solutions, which cut off most cycles and inducing paths, come first. For each further lambda,
+    only the weight of the regularization is changed, the previous optimum is given as a MIP start, and the cuts
+    collected in the cut pool so far are added to the model, as ordinary constraints if path_cuts_lazy is 0, otherwise
+    with that Lazy attribute value. Returns a list of tuples (W, Wbi, gap, runtime, lazy_count) in the order of lambdas.
+    """
+    lambdas = list(lambdas)
+    order = sorted(range(len(lambdas)), key=lambda i: lambdas[i])
+    m = build_model(X, lambdas[order[0]], loss_type, reg_type, **kwargs)
+    variables = (m._edges_vars, m._biedges_vars, m._edges_weights)
+    results = [None] * len(lambdas)
+    for position, i in enumerate(order):
+        if position > 0:
+            previous_optimum = [v.X for v in variables]
+            set_lambda(m, lambdas[i])
+            add_pool_cuts(m, lazy=path_cuts_lazy)
+            for v, start in zip(variables, previous_optimum):
+                v.Start = start
+        optimize_model(m)
+        W, Wbi = extract_solution(m, w_threshold)
+        results[i] = (W, Wbi, m.MIPGap, m.Runtime, m._lazy_count)
+    m.dispose()
+    gp.disposeDefaultEnv()
+    return results
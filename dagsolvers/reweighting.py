@@ -0,0 +1,115 @@
+import gurobipy as gp
+import numpy as np
+
+from dagsolvers.profiling import merge_records
+from dagsolvers.solve_exmag import build_model, set_l2_loss, optimize_model, extract_solution, add_pool_cuts, \
+    edges_as_indices
+from dagsolvers.sufficient_statistics import weighted_gram
+
+
+def l1_objective(X, W, edges, biedges, lambda1, reg_type):
+    """Value of the l1 loss objective of solve() for the given weights (of both directed and bidirected edges)."""
+    reg = np.sum(W ** 2) if reg_type == 'l2' else np.sum(edges) + np.sum(biedges)
+    return np.abs(X - X @ W).sum() + lambda1 * reg
+
+
+def resolve(m, gram, n, warm_start=True):
+    """Optimizes a model from build_model with its loss replaced by the l2 loss given by gram over n (see set_l2_loss),
+    with warm_start starting from its current solution. The cuts found by the previous optimizations are added to the
+    model from its cut pool first (see add_pool_cuts)."""
+    variables = (m._edges_vars, m._biedges_vars, m._edges_weights)
+    previous_optimum = [v.X for v in variables] if warm_start else None
+    set_l2_loss(m, gram, n)
+    add_pool_cuts(m)
+    if previous_optimum is not None:
+        for v, start in zip(variables, previous_optimum):
+            v.Start = start
+    optimize_model(m)
+
+
+def solve_irls(X, lambda1, reg_type, w_threshold, iterations=5, delta=1e-2, tol=1e-4, profile=False, **kwargs):
+    """Approximates the l1 loss of solve() by iteratively reweighted least squares over weighted Gram matrices.
+
+    The sum of absolute residuals sum_ij |r_ij| equals the weighted sum of squares sum_ij s_ij * r_ij^2 with
+    s_ij = 1 / |r_ij|. Each iteration solves the MILP with the weighted l2 loss, whose size depends on d only (see
+    l2_loss_from_gram), warm started from the previous solution, and updates the weights from its residuals, bounded
+    by delta times the mean absolute value of the column. The first iteration uses s_ij = 1 / (mean absolute value of
+    column j). Stops after iterations iterations or when the l1 objective changes by less than tol relatively. The
+    result is a local approximation: the support found in the last iteration need not be optimal for the l1 loss.
+    Returns the same as solve(), with profile the profile merged over the iterations. The data_weights_bound of
+    build_model is not supported, as its bounds hold for the unweighted Gram matrix only.
+    """
+    assert not kwargs.get('data_weights_bound'), 'data_weights_bound is not valid for the IRLS weighted Gram matrices'
+    edges_as_indices(X, kwargs)
+    X = np.asarray(X, dtype=float)
+    n, d = X.shape
+    scale = np.maximum(np.abs(X).mean(axis=0), 1e-12)
+    # sum_ij s_ij r_ij^2 / n + lambda1' / d * reg is the l1 objective over n for lambda1' = lambda1 * d / n
+    m = build_model(X, lambda1 * d / n, 'l2', reg_type, **kwargs)
+    sample_weights = np.tile(1 / scale, (n, 1))
+    lazy_count, stats, records = 0, [], []
+    objective = None
+    for iteration in range(iterations):
+        resolve(m, weighted_gram(X, sample_weights), n, warm_start=iteration > 0)
+        lazy_count += m._lazy_count
+        stats.extend(m._stats)
+        records.append(m._profiler.record(m))
+
+        W = m._edges_weights.X
+        residuals = X - X @ W
+        previous_objective = objective
+        objective = l1_objective(X, W, m._edges_vars.X > 0.5, m._biedges_vars.X > 0.5, lambda1, reg_type)
+        print(f'IRLS iteration {iteration}: l1 objective {objective:.6g}')
+        if previous_objective is not None and abs(previous_objective - objective) <= tol * abs(previous_objective):
+            break
+        sample_weights = 1 / np.maximum(np.abs(residuals), delta * scale)
+
+    gap = m.MIPGap
+    W, Wbi = extract_solution(m, w_threshold)
+    m.dispose()
+    gp.disposeDefaultEnv()
+    if profile:
+        return W, Wbi, gap, lazy_count, stats, merge_records(records)
+    return W, Wbi, gap, lazy_count, stats
+
+
+def solve_trimmed(X, lambda1, reg_type, w_threshold, fraction=0.9, iterations=10, profile=False, **kwargs):
+    """Approximates the robust mode of build_model by alternating trimmed least squares over weighted Gram matrices.
+
+    Starting from all the rows, each iteration solves the MILP with the l2 loss over the kept rows, warm started from
+    the previous solution, and keeps the round(fraction * n) rows with the smallest sums of squared residuals. As in
+    the robust mode, the loss is not divided by the number of rows. Stops when the kept rows do not change or after
+    iterations iterations; the model size depends on d only. Returns the same as solve(), with profile the profile
+    merged over the iterations. The data_weights_bound of build_model is not supported, as its bounds hold for the
+    Gram matrix of all the rows only.
+    """
+    assert not kwargs.get('data_weights_bound'), 'data_weights_bound is not valid for the trimmed Gram matrices'
+    edges_as_indices(X, kwargs)
+    X = np.asarray(X, dtype=float)
+    n, d = X.shape
+    kept_count = round(fraction * n)
+    m = build_model(X, lambda1, 'l2', reg_type, **kwargs)
+    kept = np.ones(n, dtype=bool)
+    lazy_count, stats, records = 0, [], []
+    for iteration in range(iterations):
+        resolve(m, weighted_gram(X, kept.astype(float)), 1, warm_start=iteration > 0)
+        lazy_count += m._lazy_count
+        stats.extend(m._stats)
+        records.append(m._profiler.record(m))
+
+        squared_residuals = ((X - X @ m._edges_weights.X) ** 2).sum(axis=1)
+        best = np.zeros(n, dtype=bool)
+        best[np.argsort(squared_residuals, kind='stable')[:kept_count]] = True
+        print(f'Trimmed iteration {iteration}: loss over the best {kept_count} rows '
+              f'{squared_residuals[best].sum():.6g}, {np.count_nonzero(best != kept)} rows changed')
+        if np.array_equal(best, kept):
+            break
+        kept = best
+
+    gap = m.MIPGap
+    W, Wbi = extract_solution(m, w_threshold)
+    m.dispose()
+    gp.disposeDefaultEnv()
+    if profile:
+        return W, Wbi, gap, lazy_count, stats, merge_records(records)
+    return W, Wbi, gap, lazy_count, stats
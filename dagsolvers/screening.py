@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def correlations(gram):
+    """Absolute correlations of the columns of X computed from the Gram matrix X^T X, zero on the diagonal."""
+    scale = np.sqrt(np.maximum(np.diag(gram), 1e-12))
+    scores = np.abs(gram) / np.outer(scale, scale)
+    np.fill_diagonal(scores, 0)
+    return scores
+
+
+def partial_correlations(gram):
+    """Absolute partial correlations of each two columns of X given all the other ones, computed from the inverse of
+    the Gram matrix X^T X, zero on the diagonal."""
+    precision = np.linalg.pinv(gram)
+    scale = np.sqrt(np.maximum(np.diag(precision), 1e-12))
+    scores = np.abs(precision) / np.outer(scale, scale)
+    np.fill_diagonal(scores, 0)
+    return scores
+
+
+def candidate_parents(gram, method='partial_correlation', k=None, threshold=None):
+    """Candidate super-structure: a (d, d) boolean matrix with entry [i, j] True if i is kept as a possible parent (or
+    bidirected neighbor) of j.
+
+    The pairs are scored by their absolute correlation or partial correlation, computed from the Gram matrix. A pair is
+    kept if its score exceeds threshold (if given) and i is among the k best scoring pairs of column j (if k is given).
+    """
+    if method == 'correlation':
+        scores = correlations(gram)
+    elif method == 'partial_correlation':
+        scores = partial_correlations(gram)
+    else:
+        assert False, f'Invalid screening method {method}'
+
+    d = len(gram)
+    candidates = ~np.eye(d, dtype=bool)
+    if threshold is not None:
+        candidates &= scores > threshold
+    if k is not None and k < d - 1:
+        best = np.argsort(-scores, axis=0, kind='stable')[:k]
+        top_k = np.zeros((d, d), dtype=bool)
+        top_k[best, np.arange(d)] = True
+        candidates &= top_k
+    return candidates
+
+
+def weight_bounds(gram, margin=1.0):
+    """Bounds on the absolute values of least squares weights, [k, j] for the weight of k in any regression of j.
+
+    The weight of k in the regression of j on a set S containing k is cov(k, j | R) / var(k | R) with R = S - {k}, which
+    is by Cauchy-Schwarz at most sqrt(var(j | R) / var(k | R)). Here var(j | R) <= gram_jj and var(k | R) is at least
+    the variance of k given all the other columns, 1 / precision_kk, so the bound is sqrt(precision_kk * gram_jj),
+    multiplied by margin. If the Gram matrix is singular, the bounds are infinite.
+    """
+    try:
+        precision = np.linalg.inv(gram)
+    except np.linalg.LinAlgError:
+        return np.full(gram.shape, np.inf)
+    precision_diagonal = np.diag(precision)
+    if not np.all(np.isfinite(precision_diagonal)) or np.any(precision_diagonal <= 0):
+        return np.full(gram.shape, np.inf)
+    return margin * np.sqrt(np.outer(precision_diagonal, np.diag(gram)))
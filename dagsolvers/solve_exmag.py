@@ -1,62 +1,103 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import gurobipy as gp
 import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
 from gurobipy import GRB
 import notears.utils as utils
 
 import igraph as ig
 
-from dagsolvers.dagsolver_utils import apply_threshold, find_optimal_threshold_for_shd, find_minimal_dag_threshold, tupledict_to_np_matrix
-from dagsolvers.magseparation import floyd_warshall, check_for_inducing_path, check_for_almost_directed_cycles
-
-
-def find_cycles(edges, mode):
-    vertices = set(e[0] for e in edges)
-    vertices.update(e[1] for e in edges)
-
-    visited = set()
-    on_stack = set()
-    parent = {}
-    stack = []
+from dagsolvers.cutpool import CutPool, cut_expression, edges_sum
+from dagsolvers.dagsolver_utils import apply_threshold, find_optimal_threshold_for_shd, find_minimal_dag_threshold
+from dagsolvers.heuristic import greedy_mag
+from dagsolvers.profiling import CallbackProfiler, merge_records
+from dagsolvers.magseparation import AncestorEdgeIndex, ReachabilityCache, check_for_inducing_path, \
+    check_for_almost_directed_cycles, separate_fractional_cycles
+from dagsolvers.screening import candidate_parents, weight_bounds
+from dagsolvers.sufficient_statistics import SufficientStatistics, gram_matrix, select_columns
+
+
+def adjacency_lists(adj):
+    """CSR representation (indptr, indices) of the edges adj > 0.5, as python lists for fast scalar access."""
+    adj = np.asarray(adj) > 0.5
+    rows, cols = np.nonzero(adj)
+    indptr = np.searchsorted(rows, np.arange(len(adj) + 1))
+    return indptr.tolist(), cols.tolist()
+
+
+def _cycle_from_path(path):
+    # path p0 -> p1 -> ... -> pk closed by pk -> p0, cycles are reported as [p0, pk, ..., p1]
+    return [path[0]] + path[:0:-1]
+
+
+def shortest_cycle_through(indptr, indices, s, removed=None):
+    """BFS for a shortest cycle through s that avoids the CSR positions in removed; returns the cycle or None."""
+    parent = {s: None}
+    queue = deque([s])
+    while queue:
+        v = queue.popleft()
+        for position in range(indptr[v], indptr[v + 1]):
+            if removed is not None and position in removed:
+                continue
+            w = indices[position]
+            if w == s:
+                path = [v]
+                while parent[path[-1]] is not None:
+                    path.append(parent[path[-1]])
+                return _cycle_from_path(path[::-1])
+            if w not in parent:
+                parent[w] = v
+                queue.append(w)
+    return None
+
+
+def find_cycles(adj, mode, max_cycles=None):
+    """Finds directed cycles of the graph adj > 0.5 by a single DFS over its adjacency lists.
+
+    Every back edge of the DFS closes one cycle. 'all_cycles' returns all of them, 'shortest_cycle' the shortest one,
+    and 'disjoint_cycles' at most max_cycles pairwise edge-disjoint cycles, each a shortest cycle (found by BFS) through
+    a vertex of the DFS cycles in the graph without the edges of the previously selected cycles. A cycle [c0, ..., ck]
+    consists of edges (c_i+1, c_i) and (c0, ck).
+    """
+    indptr, indices = adjacency_lists(adj)
+    n = len(indptr) - 1
+
+    unvisited, on_stack, done = 0, 1, 2
+    state = [unvisited] * n
+    pointer = indptr[:-1]
+    depth = [0] * n
     shortest_cycle = None
     found_cycles = []
-    number_of_cycles = 0
 
-    for root in vertices:
-        if root in visited:
+    for root in range(n):
+        if state[root] != unvisited:
             continue
-        stack.append(root)
+        stack = [root]
+        state[root] = on_stack
         while stack:
             v = stack[-1]
-            if v not in visited:
-                visited.add(v)
-                on_stack.add(v)
-            else:
-                if v in on_stack:
-                    on_stack.remove(v)
-                # else:
-                #     print('DEBUG')
+            if pointer[v] == indptr[v + 1]:
+                state[v] = done
                 stack.pop()
+                continue
+            w = indices[pointer[v]]
+            pointer[v] += 1
+            if state[w] == unvisited:
+                state[w] = on_stack
+                depth[w] = len(stack)
+                stack.append(w)
+            elif state[w] == on_stack:  # back edge v -> w closes the cycle w -> ... -> v -> w
+                if mode == 'shortest_cycle':
+                    if shortest_cycle is None or len(stack) - depth[w] < len(shortest_cycle):
+                        shortest_cycle = _cycle_from_path(stack[depth[w]:])
+                else:
+                    found_cycles.append(_cycle_from_path(stack[depth[w]:]))
 
-            neighbors = [e[1] for e in edges if e[0] == v]
-            for neighbor in neighbors:
-                if neighbor not in visited:
-                    stack.append(neighbor)
-                    parent[neighbor] = v
-                elif neighbor in on_stack:
-                    number_of_cycles += 1
-                    # Found a cycle
-                    cycle = [neighbor, v]  # Back edge
-                    p = parent[v]
-                    while p != neighbor:
-                        cycle.append(p)
-                        p = parent[p]
-                    # print(cycle)
-                    # return cycle # return the first found cycle
-                    found_cycles.append(cycle)
-                    if shortest_cycle is None or len(shortest_cycle) > len(cycle):
-                        shortest_cycle = cycle
-
-    # print(f'number of cycles: {number_of_cycles}')
     if mode == 'shortest_cycle':
         if shortest_cycle is not None:
             return [shortest_cycle]
@@ -64,21 +105,269 @@ def find_cycles(edges, mode):
             return []
     elif mode == 'all_cycles':
         return found_cycles
+    elif mode == 'disjoint_cycles':
+        positions = {(v, indices[p]): p for v in range(n) for p in range(indptr[v], indptr[v + 1])}
+        removed = set()
+        disjoint_cycles = []
+        for s in dict.fromkeys(v for cycle in sorted(found_cycles, key=len) for v in cycle):
+            while max_cycles is None or len(disjoint_cycles) < max_cycles:
+                cycle = shortest_cycle_through(indptr, indices, s, removed)
+                if cycle is None:  # no more cycles through s
+                    break
+                disjoint_cycles.append(cycle)
+                removed.update(positions[cycle[i + 1], cycle[i]] for i in range(len(cycle) - 1))
+                removed.add(positions[cycle[0], cycle[-1]])
+        return disjoint_cycles
     else:
         assert False, f'Invalid mode{mode}'
 
 
 def extract_adj_matrix(edges_vals, weights_vals, d):
-    W = np.zeros((d, d))
-    for v1 in range(d):
-        for v2 in range(d):
-            if v1 != v2:
-                if edges_vals[v1, v2] > 0.5:
-                    W[v1, v2] = weights_vals[(v1, v2)]
+    W = np.where(edges_vals > 0.5, weights_vals, 0.0)
+    np.fill_diagonal(W, 0)
     return W
 
 
+def l2_loss_matrices(gram, d, allowed=None, n=1):
+    """Matrices (quad, lin, constant) of the sum of squared residuals sum_ij (X_ij - sum_k X_ik * w_kj)^2 over n,
+    which is w^T quad w + lin^T w + constant with w = vec(W) in row-major order, expressed through the Gram matrix X^T X.
+
+    The expansion per column j is gram_jj - 2 * gram_.j^T w_.j + w_.j^T gram w_.j, so the loss has O(d^3) terms
+    independently of the number of samples. The quadratic part summed over all columns is w^T (gram kron I) w, of which
+    quad is the upper triangle (with the off-diagonal entries doubled) as a sparse COO matrix. Only the weights of the
+    allowed (by default, off-diagonal) pairs appear.
+
+    gram can also be a (d, d, d) stack with a separate Gram matrix gram[j] for each column j, e.g., X^T diag(s_.j) X
+    for the weighted sum of squares sum_ij s_ij * (X_ij - sum_k X_ik * w_kj)^2.
+    """
+    off_diagonal = 1 - np.eye(d)
+    if allowed is not None:
+        off_diagonal = off_diagonal * allowed
+    # entry (k * d + j, l * d + j) for k <= l is gram[k, l] (or gram[j, k, l]) if both w_kj and w_lj appear
+    k, l = np.triu_indices(d)
+    j = np.arange(d)[:, None]
+    if gram.ndim == 2:
+        values = np.broadcast_to(gram[k, l], (d, len(k)))
+        lin = gram * off_diagonal
+        constant = float(np.trace(gram))
+    else:
+        values = gram[:, k, l]
+        lin = np.einsum('jkj->kj', gram) * off_diagonal
+        constant = float(np.einsum('jjj->', gram))
+    keep = (off_diagonal[k, :] * off_diagonal[l, :]).T > 0
+    j, k, l = (np.broadcast_to(index, keep.shape)[keep] for index in (j, k, l))
+    quad = sp.coo_matrix((values[keep] * np.where(k == l, 1, 2) / n, (k * d + j, l * d + j)), shape=(d * d, d * d))
+    return quad, -2 * lin.reshape(-1) / n, constant / n
+
+
+def l2_loss_from_gram(gram, edges_weights, d, allowed=None):
+    """Sum of squared residuals sum_ij (X_ij - sum_k X_ik * w_kj)^2 as a quadratic expression of edges_weights, see
+    l2_loss_matrices."""
+    quad, lin, constant = l2_loss_matrices(gram, d, allowed)
+    w = edges_weights.reshape(-1)
+    return w @ quad.tocsr() @ w + lin @ w + constant
+
+
+def allowed_edges(tabu_matrix, candidates=None):
+    """0/1 matrices of the allowed directed and bidirected edges.
+
+    Directed edges are allowed only outside the tabu matrix, bidirected only inside of it, and never on the diagonal.
+    With a candidates matrix, a directed edge i -> j is further allowed only if candidates[i, j] and a bidirected edge
+    only if candidates[i, j] or candidates[j, i].
+    """
+    tabu_matrix = np.asarray(tabu_matrix)
+    off_diagonal = 1 - np.eye(len(tabu_matrix), dtype=int)
+    directed = (1 - tabu_matrix) * off_diagonal
+    bidirected = tabu_matrix * off_diagonal
+    if candidates is not None:
+        candidates = np.asarray(candidates, dtype=bool)
+        directed = directed * candidates
+        bidirected = bidirected * (candidates | candidates.T)
+    return directed, bidirected
+
+
+class BidirectedPairVars:
+    """Bidirected edge variables with one binary per unordered pair {u, v} of the symmetric 0/1 matrix allowed.
+
+    Mimics the symmetric (d, d) MVar of the full formulation: [u, v] and [v, u] give the same variable, and X, Start,
+    Obj and ub are read and written as (d, d) matrices. The Obj of a pair is the sum of the two entries of the matrix,
+    and sum() counts each selected pair twice, so the objectives of both formulations agree. Values obtained in a
+    callback for the MVar pairs are converted by matrix.
+    """
+
+    def __init__(self, m, allowed, name='biedge'):
+        self.d = len(allowed)
+        self.shape = (self.d, self.d)
+        self.upper, self.lower = np.nonzero(np.triu(allowed, k=1))
+        self.index = np.full(self.shape, -1)
+        self.index[self.upper, self.lower] = self.index[self.lower, self.upper] = np.arange(len(self.upper))
+        self.pairs = m.addMVar(len(self.upper), vtype=GRB.BINARY, name=name)
+
+    def __getitem__(self, edge):
+        u, v = edge
+        assert self.index[u, v] >= 0, f'No bidirected variable for the pair {u, v}'
+        return self.pairs[self.index[u, v]]
+
+    def __len__(self):
+        return len(self.upper)
+
+    def matrix(self, values):
+        matrix = np.zeros(self.shape)
+        matrix[self.upper, self.lower] = matrix[self.lower, self.upper] = values
+        return matrix
+
+    def sum(self):
+        return 2 * self.pairs.sum()
+
+    @property
+    def X(self):
+        return self.matrix(self.pairs.X)
+
+    @property
+    def ub(self):
+        return self.matrix(self.pairs.ub)
+
+    @property
+    def Start(self):
+        return self.matrix(self.pairs.Start)
+
+    @Start.setter
+    def Start(self, values):
+        self.pairs.Start = np.asarray(values)[self.upper, self.lower]
+
+    @property
+    def Obj(self):
+        return self.matrix(self.pairs.Obj / 2)
+
+    @Obj.setter
+    def Obj(self, values):
+        values = np.asarray(values)
+        self.pairs.Obj = values[self.upper, self.lower] + values[self.lower, self.upper]
+
+
+def bidirected_values(values_of, biedges_vars):
+    """(d, d) matrix of the values of the bidirected edge variables, as given by values_of (e.g.,
+    model.cbGetSolution) for an MVar, in either formulation."""
+    if isinstance(biedges_vars, BidirectedPairVars):
+        return biedges_vars.matrix(values_of(biedges_vars.pairs)) if len(biedges_vars) else np.zeros(biedges_vars.shape)
+    return values_of(biedges_vars)
+
+
+def add_mag_variables(m, d, tabu_matrix, weights_bound=100.0, constraints_mode='weights', candidates=None,
+                      compact_bidirected=False):
+    """Adds the (d, d) blocks of directed edge, bidirected edge and weight variables together with their linking
+    constraints to the model m.
+
+    The edges not in allowed_edges(tabu_matrix, candidates) are excluded by variable bounds, which also makes a
+    directed and a bidirected edge between the same pair mutually exclusive. The linking constraints are added as
+    sparse matrix blocks over the allowed pairs only, so a sparse candidate super-structure gives a small model.
+    weights_bound is either a number or a (d, d) matrix of bounds on the absolute values of the individual weights.
+
+    With compact_bidirected, the bidirected edges are BidirectedPairVars with one variable per allowed unordered pair,
+    which both weights of the pair are linked to, instead of a (d, d) MVar with equality constraints between [u, v]
+    and [v, u].
+    """
+    directed, bidirected = allowed_edges(tabu_matrix, candidates)
+    allowed = (directed + bidirected) > 0
+    weights_bound = np.broadcast_to(np.asarray(weights_bound, dtype=float), (d, d))
+    edges_vars = m.addMVar((d, d), vtype=GRB.BINARY, ub=directed, name='edge')
+    if compact_bidirected:
+        biedges_vars = BidirectedPairVars(m, bidirected)
+    else:
+        biedges_vars = m.addMVar((d, d), vtype=GRB.BINARY, ub=bidirected, name='biedge')
+    weights_lb = np.where(allowed, -weights_bound, 0.0)
+    weights_ub = np.where(allowed, weights_bound, 0.0)
+    edges_weights = m.addMVar((d, d), lb=weights_lb, ub=weights_ub, vtype=GRB.CONTINUOUS, name='weight')
+
+    pairs = np.flatnonzero(allowed)
+    select = sp.identity(d * d, format='csr')[pairs]
+    if compact_bidirected:
+        # row of the ordered pair (i, j) selects the variable of the unordered pair {i, j}, if there is one
+        columns = biedges_vars.index.reshape(-1)[pairs]
+        rows = np.flatnonzero(columns >= 0)
+        bi_select = sp.csr_matrix((np.ones(len(rows)), (rows, columns[rows])), shape=(len(pairs), len(biedges_vars)))
+        biedges_list = biedges_vars.pairs.tolist()
+    else:
+        bi_select = select
+        biedges_list = biedges_vars.reshape(-1).tolist()
+    bounds = sp.diags(weights_bound.reshape(-1)[pairs])
+    x = edges_vars.reshape(-1).tolist() + biedges_list + edges_weights.reshape(-1).tolist()
+    zeros = np.zeros(len(pairs))
+    if constraints_mode == 'no-weights':
+        # weight == edge + biedge
+        m.addMConstr(sp.hstack([-select, -bi_select, select]), x, GRB.EQUAL, zeros)
+    else:
+        # |weight| <= weights_bound * (edge + biedge)
+        m.addMConstr(sp.hstack([-bounds @ select, -bounds @ bi_select, select]), x, GRB.LESS_EQUAL, zeros)
+        m.addMConstr(sp.hstack([-bounds @ select, -bounds @ bi_select, -select]), x, GRB.LESS_EQUAL, zeros)
+
+    lower, upper = np.tril_indices(d, -1)
+    # no anti-parallel edges
+    both = (directed[lower, upper] > 0) & (directed[upper, lower] > 0)
+    if both.any():
+        m.addConstr(edges_vars[lower[both], upper[both]] + edges_vars[upper[both], lower[both]] <= 1)
+    # bidirectional edges need to be both uv and vu
+    both = bidirected[lower, upper] > 0
+    if both.any() and not compact_bidirected:
+        m.addConstr(biedges_vars[lower[both], upper[both]] == biedges_vars[upper[both], lower[both]])
+    return edges_vars, biedges_vars, edges_weights
+
+
+def add_lazy_cuts(model, cuts):
+    """Adds the cuts (directed edges, bidirected edges) as lazy constraints unless they are already in the cut pool.
+
+    If all of them are in the pool, they are added again anyway, as the incumbent has to be cut off.
+    """
+    new_cuts = [cut for cut in cuts if model._cut_pool.add(*cut)]
+    if not new_cuts:
+        new_cuts = list({CutPool.key(*cut): cut for cut in cuts}.values())
+    model._suppressed_cuts += len(cuts) - len(new_cuts)
+    for directed_edges, bidirected_edges in new_cuts:
+        lhs, rhs = cut_expression(model._edges_vars, model._biedges_vars, directed_edges, bidirected_edges)
+        model._lazy_count += 1
+        model.cbLazy(lhs <= rhs)
+    return len(new_cuts) > 0
+
+
+def separate_user_cuts(model):
+    """Adds the cycle and almost directed cycle inequalities violated by the node relaxation as user cuts."""
+    options = model._user_cuts
+    stats = model._user_cut_stats
+    if model.cbGet(GRB.Callback.MIPNODE_STATUS) != GRB.OPTIMAL:
+        return
+    node_count = int(model.cbGet(GRB.Callback.MIPNODE_NODCNT))
+    if node_count % options['frequency'] != 0 or (options['max_nodes'] is not None and node_count > options['max_nodes']):
+        return
+
+    edges_rel = model.cbGetNodeRel(model._edges_vars)
+    biedges_rel = bidirected_values(model.cbGetNodeRel, model._biedges_vars)
+    with model._profiler.stage('user_cuts'):
+        cycle_cuts, almost_directed_cuts = separate_fractional_cycles(edges_rel, biedges_rel,
+                                                                      max_cuts=options['max_cuts'])
+    model._profiler.cuts('user_cycle', cycle_cuts)
+    model._profiler.cuts('user_almost_directed_cycle', almost_directed_cuts)
+    for edges_of_cycle in cycle_cuts:
+        model.cbCut(edges_sum(model._edges_vars, edges_of_cycle) <= len(edges_of_cycle) - 1)
+    for directed_edges, bidirected_edges in almost_directed_cuts:
+        model.cbCut(edges_sum(model._edges_vars, directed_edges) + edges_sum(model._biedges_vars, bidirected_edges)
+                    <= len(directed_edges) + len(bidirected_edges) - 1)
+
+    bound = model.cbGet(GRB.Callback.MIPNODE_OBJBND)
+    stats['separations'] += 1
+    stats['cycle_cuts'] += len(cycle_cuts)
+    stats['almost_directed_cycle_cuts'] += len(almost_directed_cuts)
+    if stats['first_bound'] is None:
+        stats['first_bound'] = bound
+    stats['last_bound'] = bound
+
+
 def check_for_mag(model, where):
+    callback_start = time.perf_counter()
+    profiler = model._profiler
+    if where == GRB.Callback.MIP:
+        profiler.bounds(model.cbGet(GRB.Callback.RUNTIME), model.cbGet(GRB.Callback.MIP_OBJBST),
+                        model.cbGet(GRB.Callback.MIP_OBJBND))
+
     if where == GRB.Callback.MESSAGE:
         pass
         # edges_vals = model.cbGetSolution(model._edges_vars)
@@ -86,208 +375,532 @@ def check_for_mag(model, where):
         # W = extract_adj_matrix(edges_vals, weights_vals)
         # print(W)
 
+    if where == GRB.Callback.MIPNODE and model._user_cuts is not None:
+        separate_user_cuts(model)
+
     if where == GRB.Callback.MIPSOL:
         # print('CALLBACK')
         # make a list of edges selected in the solution
-        constr_added = False
-        edges_vals = model.cbGetSolution(model._edges_vars)
-        edges_vals = tupledict_to_np_matrix(edges_vals, model._d)
-        biedges_vals = model.cbGetSolution(model._biedges_vars)
-        biedges_vals = tupledict_to_np_matrix(biedges_vals, model._d)
-        weights_vals = model.cbGetSolution(model._edges_weights)
-        selected_edges = gp.tuplelist((i, j) for i, j in model._edges_vars.keys() if edges_vals[i, j] > 0.5)
+        with profiler.stage('get_solution'):
+            edges_vals = model.cbGetSolution(model._edges_vars)
+            biedges_vals = bidirected_values(model.cbGetSolution, model._biedges_vars)
+            weights_vals = model.cbGetSolution(model._edges_weights)
 
         # find the shortest cycle in the selected edge list
-        cycles = find_cycles(selected_edges, model._callback_mode)
+        with profiler.stage('cycles'):
+            cycles = find_cycles(edges_vals, model._callback_mode, model._max_cycles)
+        cuts = []
         for cycle in cycles:
             edges_of_cycle = []
             for i in range(len(cycle) - 1):
                 edges_of_cycle.append((cycle[i + 1], cycle[i]))
             edges_of_cycle.append((cycle[0], cycle[-1]))
-            # callback_constraints[1] = callback_constraints[1] + 1
-            # print('NEW CONSTRAINT')
-            model._lazy_count += 1
-            model.cbLazy(gp.quicksum(model._edges_vars[i, j] for i, j in edges_of_cycle)
-                         <= len(edges_of_cycle) - 1)
-            constr_added = True
+            cuts.append((edges_of_cycle, []))
 
         # find the almost directed cycles and inducing paths
         # TODO ajd and biadj might not work with model.cbGetSolution
-        fwdist = floyd_warshall(edges_vals)
-        almost_directed_cycles = check_for_almost_directed_cycles(edges_vals, biedges_vals, fwdist)
-        inducing_paths = check_for_inducing_path(edges_vals, biedges_vals, fwdist)
-        for lst in (almost_directed_cycles, inducing_paths):
-            for directed_edges, bidirected_edges in lst:
-                model._lazy_count += 1
-                model.cbLazy(gp.quicksum(model._edges_vars[i, j] for i, j in directed_edges) +
-                             gp.quicksum(model._biedges_vars[i, j] for i, j in bidirected_edges)
-                             <= len(directed_edges) + len(bidirected_edges) - 1)
-                constr_added = True
+        with profiler.stage('reachability'):
+            fwdist = model._reachability.distances(edges_vals)
+        with profiler.stage('ancestor_index'):
+            index = AncestorEdgeIndex(fwdist, edges_vals)
+        with profiler.stage('almost_directed_cycles'):
+            almost_directed_cycles = check_for_almost_directed_cycles(edges_vals, biedges_vals, fwdist, index=index)
+        with profiler.stage('inducing_paths'):
+            inducing_paths = check_for_inducing_path(edges_vals, biedges_vals, fwdist, index=index,
+                                                     **model._inducing_path_options)
+        profiler.cuts('cycle', cuts)
+        profiler.cuts('almost_directed_cycle', almost_directed_cycles)
+        profiler.cuts('inducing_path', inducing_paths)
+        cuts.extend(almost_directed_cycles)
+        cuts.extend(inducing_paths)
+        with profiler.stage('add_cuts'):
+            constr_added = add_lazy_cuts(model, cuts)
 
         # Compute solving statistics
         rt = model.cbGet(GRB.Callback.RUNTIME)
         if not constr_added and model._B_ref is not None and (
                 rt - model._last_time_stats > 60):  # Compute statistics every 60 seconds
-            B_true = model._B_ref
-            model._last_time_stats = rt
-            W_sol = extract_adj_matrix(edges_vals, weights_vals, model._d)
-            Wbi_sol = extract_adj_matrix(biedges_vals, weights_vals, model._d)
-            dag_t, W_sol = find_minimal_dag_threshold(W_sol)  # TODO what is this?
-            # W_sol = apply_threshold(W_sol, 0.3)
-            default_threshold = 0.3
-            W_t = apply_threshold(W_sol, default_threshold)
-            shd = utils.count_accuracy(B_true, W_t != 0)['shd']
-            objval = model.cbGet(GRB.Callback.MIPSOL_OBJ)
-
-            best_t, best_shd = find_optimal_threshold_for_shd(B_true, W_sol, [], [], np.zeros_like(B_true), Wbi_sol)
-
-            print(f't{default_threshold}_SHD: {shd} BEST_SHD: {best_shd} BEST_t: {best_t} OBJ: {objval} DAG_t: {dag_t}')
-            model._stats.append((round(rt), shd, best_shd, best_t, objval, dag_t))
-
-
-def solve(X, lambda1, loss_type, reg_type, w_threshold, tabu_edges={}, B_ref=None, mode='shortest_cycle',
-          time_limit=300, robust=False, weights_bound=100.0, constraints_mode='weights'):
-    """Tabu edges are a set of pairs of integers or column names in X."""
+            with profiler.stage('statistics'):
+                B_true = model._B_ref
+                model._last_time_stats = rt
+                W_sol = extract_adj_matrix(edges_vals, weights_vals, model._d)
+                Wbi_sol = extract_adj_matrix(biedges_vals, weights_vals, model._d)
+                dag_t, W_sol = find_minimal_dag_threshold(W_sol)  # TODO what is this?
+                # W_sol = apply_threshold(W_sol, 0.3)
+                default_threshold = 0.3
+                W_t = apply_threshold(W_sol, default_threshold)
+                shd = utils.count_accuracy(B_true, W_t != 0)['shd']
+                objval = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+
+                best_t, best_shd = find_optimal_threshold_for_shd(B_true, W_sol, [], [], np.zeros_like(B_true),
+                                                                  Wbi_sol)
+
+                print(f't{default_threshold}_SHD: {shd} BEST_SHD: {best_shd} BEST_t: {best_t} OBJ: {objval} '
+                      f'DAG_t: {dag_t}')
+                model._stats.append((round(rt), shd, best_shd, best_t, objval, dag_t))
+
+    profiler.callback(where, time.perf_counter() - callback_start)
+
+
+def pairs_matrix(X, pairs):
+    """Symmetric (d, d) 0/1 matrix of the given pairs of integers or column names in X."""
+    d = X.shape[1]
+    # convert the pairs from variable names, just for the case,
+    if not all(isinstance(item, (int, np.integer)) for sublist in pairs for item in sublist):
+        name_to_index = {name: index for index, name in enumerate(X.columns)}
+        pairs = {(name_to_index[a], name_to_index[b]) for a, b in pairs}
+    matrix = np.zeros((d, d), dtype=bool)
+    for i, j in pairs:
+        matrix[i, j] = True
+        matrix[j, i] = True
+    return matrix.astype(int)
+
+
+def candidates_matrix(X, forbidden_edges=(), candidates=None, screening_k=None, screening_threshold=None):
+    """(d, d) boolean matrix with entry [i, j] True if i may be a parent or a bidirected neighbor of j: all pairs but
+    the forbidden ones, restricted by candidates, which is either such a matrix or the method of
+    screening.candidate_parents used with screening_k and screening_threshold. The diagonal is False."""
+    allowed = (pairs_matrix(X, forbidden_edges) == 0) & ~np.eye(X.shape[1], dtype=bool)
+    if isinstance(candidates, str):
+        candidates = candidate_parents(gram_matrix(X), candidates, screening_k, screening_threshold)
+    if candidates is not None:
+        allowed &= np.asarray(candidates, dtype=bool)
+    return allowed
+
+
+def build_model(X, lambda1, loss_type, reg_type, tabu_edges={}, B_ref=None, mode='shortest_cycle', time_limit=300,
+                robust=False, weights_bound=100.0, constraints_mode='weights', inducing_path_max_length=None,
+                inducing_path_limit=None, inducing_path_order='dfs', max_cycles=10, user_cuts=False,
+                user_cuts_frequency=1, user_cuts_max_nodes=None, user_cuts_per_node=20, cut_pool=None, cut_pool_lazy=1,
+                warm_start=True, threads=None, forbidden_edges=(), candidates=None, screening_k=None,
+                screening_threshold=None, data_weights_bound=False, weights_bound_margin=1.1, compact_bidirected=True,
+                robust_fraction=0.9):
+    """Builds the ExMAG model together with the state of its callback check_for_mag.
+
+    X is the (n, d) data matrix or, for the l2 loss without the robust mode, its SufficientStatistics.
+
+    Tabu edges are a set of pairs of integers or column names in X. Between a tabu pair, only a bidirected edge is
+    allowed, between any other pair only a directed edge. Between forbidden pairs (given in the same way), no edge is
+    allowed.
+
+    candidates restricts the model to a candidate super-structure (see candidates_matrix), either given as a boolean
+    matrix or computed by screening with the method 'correlation' or 'partial_correlation' keeping the screening_k best
+    scoring candidate parents of each variable with score above screening_threshold. The variables of the other pairs
+    are fixed to zero and their constraints and objective terms are omitted.
+
+    The weights are bounded in absolute value by weights_bound. With data_weights_bound and the l2 loss (not robust),
+    the bound of each weight is tightened to screening.weight_bounds, a bound on least squares weights computed from the
+    Gram matrix, multiplied by the safety margin weights_bound_margin.
+
+    With robust, the l2 loss is the sum of squared residuals over the robust_fraction of the samples chosen by binary
+    variables, i.e., those fitting best. This adds a binary per sample and n * d quadratic constraints, so it is
+    tractable only for small n; solve() with robust='trimmed' approximates it by trimmed least squares instead.
+
+    With compact_bidirected, there is a single bidirected edge variable per unordered pair (see BidirectedPairVars),
+    otherwise one per ordered pair with the two tied by an equality constraint.
+
+    The mode of the directed cycle separation is one of 'shortest_cycle', 'all_cycles' and 'disjoint_cycles', the last
+    one adding at most max_cycles edge-disjoint cycle cuts per callback.
+
+    The inducing path separation in the callback can be bounded: inducing_path_max_length limits the number of
+    bidirected edges on a path (longer inducing paths are then not cut off, so the result may not be a MAG),
+    inducing_path_limit limits the number of distinct cuts added per callback, and inducing_path_order is either 'dfs'
+    or 'shortest' (enumerate shorter paths first, useful together with the limit).
+
+    With user_cuts, the cycle and almost directed cycle inequalities violated by the LP relaxation are separated at
+    every user_cuts_frequency-th node among the first user_cuts_max_nodes nodes (all if None), adding at most
+    user_cuts_per_node cuts of each kind.
+
+    cut_pool is a CutPool collecting the lazy cuts found by the callback, which also skips cuts already in the pool.
+    The cuts the pool holds at the start (e.g., loaded from an earlier solve over the same variables) are added to the
+    model upfront, as ordinary constraints if cut_pool_lazy is 0, otherwise with that Lazy attribute value.
+
+    With warm_start, a MAG constructed greedily from the Gram matrix (see heuristic.greedy_mag, which takes O(d^2) time
+    per edge it adds) together with its least squares weights is given to Gurobi as a MIP start.
+
+    threads limits the number of threads used by Gurobi (by default, all cores), e.g., when several models are solved
+    in parallel processes.
+    """
     n, d = X.shape
 
     # 'no-weights'
     # if loss_type == 'l2':
     #     X = X - np.mean(X, axis=0, keepdims=True)
 
-    # convert tabu edges from variable names, just for the case,
-    if not all(isinstance(item, int) for sublist in tabu_edges for item in sublist):
-        name_to_index = {name: index for index, name in enumerate(X.columns)}
-        tabu_edges = {(name_to_index[a], name_to_index[b]) for a, b in tabu_edges}
-    tabu_matrix = np.zeros((d, d), dtype=bool)
-    for i, j in tabu_edges:
-        tabu_matrix[i, j] = True
-        tabu_matrix[j, i] = True
-    tabu_matrix = tabu_matrix.astype(int)
+    tabu_matrix = pairs_matrix(X, tabu_edges)
+    candidates = candidates_matrix(X, forbidden_edges, candidates, screening_k, screening_threshold)
+    directed, bidirected = allowed_edges(tabu_matrix, candidates)
+    full_directed, full_bidirected = allowed_edges(tabu_matrix)
+    if candidates.sum() < d * (d - 1):
+        print(f'Candidate super-structure: {directed.sum()} of {full_directed.sum()} directed and '
+              f'{bidirected.sum() // 2} of {full_bidirected.sum() // 2} bidirected edges kept')
+
+    assert robust in (False, True), 'The trimmed robust mode is solved by solve(), not by a single model'
+    if isinstance(X, SufficientStatistics):
+        assert loss_type == 'l2' and not robust, 'Sufficient statistics suffice only for the l2 loss, not robust'
+    else:
+        X = np.asarray(X, dtype=float)
+    gram = gram_matrix(X)
+    if data_weights_bound and loss_type == 'l2' and not robust and constraints_mode != 'no-weights':
+        weights_bound = np.minimum(weights_bound, weight_bounds(gram, weights_bound_margin))
 
     m = gp.Model()
-    edges_vars = {}
-    biedges_vars = {}
-    edges_weights = {}
-
-    for v1 in range(d):
-        for v2 in range(d):
-            if v1 != v2:
-                edges_vars[v1, v2] = m.addVar(vtype=GRB.BINARY, name=f'{v1}->{v2}')
-                biedges_vars[v1, v2] = m.addVar(vtype=GRB.BINARY, name=f'{v1}<->{v2}')
-                edges_weights[v1, v2] = m.addVar(lb=float('-inf'), vtype=GRB.CONTINUOUS, name=f'weight{v1}->{v2}')
-
-                if constraints_mode == 'no-weights':
-                    m.addConstr(edges_weights[v1, v2] == (edges_vars[v1, v2] + biedges_vars[v1, v2]))
-                else:
-                    m.addConstr(edges_weights[v1, v2] <= weights_bound * (edges_vars[v1, v2] + biedges_vars[v1, v2]))
-                    m.addConstr(-edges_weights[v1, v2] <= weights_bound * (edges_vars[v1, v2] + biedges_vars[v1, v2]))
-
-                # either bi-directional edge, or normal, not both
-                m.addConstr(edges_vars[v1, v2] + biedges_vars[v1, v2] <= 1)
-                # no directed edge where none should be
-                m.addConstr(edges_vars[v1, v2] + tabu_matrix[v1, v2] <= 1)
-                # bidirectional edge only if directed is forbidden
-                m.addConstr(biedges_vars[v1, v2] <= tabu_matrix[v1, v2])
-
-    for v1 in range(d):
-        for v2 in range(v1):
-            # no anti-parallel edges
-            m.addConstr(edges_vars[v2, v1] + edges_vars[v1, v2] <= 1)
-
-            # bidirectional edges need to be both uv and vu
-            m.addConstr(biedges_vars[v1, v2] == biedges_vars[v2, v1])
-
+    edges_vars, biedges_vars, edges_weights = add_mag_variables(m, d, tabu_matrix, weights_bound, constraints_mode,
+                                                                candidates, compact_bidirected)
 
     # no need to change criterion for MAG version
-    robust_vars = {}
-    quad_diff = {}
     if robust:
-        for i in range(n):
-            robust_vars[i] = m.addVar(vtype=GRB.BINARY, name=f's{i}')
-            for j in range(d):
-                quad_diff[i, j] = m.addVar(lb=float('-inf'), vtype=GRB.CONTINUOUS, name=f'q{i}-{j}')
-        r = round(0.9 * n)
-        m.addConstr(gp.quicksum(robust_vars[i] for i in range(n)) >= r)
-        for i in range(n):
-            for j in range(d):
-                m.addConstr((X[i, j] - gp.quicksum(X[i, k] * edges_weights[k, j] for k in range(d) if k != j)) ** 2 ==
-                            quad_diff[i, j])
-        robust_objective = gp.quicksum(quad_diff[i, j] * robust_vars[i] for i in range(n) for j in range(d))
-    # callback_constraints = {}
-    # callback_constraints[1] = 0
+        robust_vars = m.addMVar(n, vtype=GRB.BINARY, name='s')
+        quad_diff = m.addMVar((n, d), lb=float('-inf'), vtype=GRB.CONTINUOUS, name='q')
+        r = round(robust_fraction * n)
+        m.addConstr(robust_vars.sum() >= r)
+        residuals = X - X @ edges_weights
+        m.addConstr(residuals * residuals == quad_diff)
+        robust_objective = (quad_diff * robust_vars[:, None]).sum()
 
     # regulazition
     if reg_type == 'l2':
-        reg = gp.quicksum(w ** 2 for w in edges_weights.values())
+        reg = edges_weights.reshape(-1) @ edges_weights.reshape(-1)
     elif reg_type == 'l1':
-        reg = gp.quicksum(w for w in edges_vars.values()) + gp.quicksum(w for w in biedges_vars.values())
+        reg = edges_vars.sum() + biedges_vars.sum()
     else:
         assert False
 
     # Cost function
+    reg_scale = 1 / d
     if loss_type == 'l2':
         if robust:
-            m.setObjective(robust_objective + lambda1 * reg / d, GRB.MINIMIZE)
+            loss = robust_objective
         else:
-            m.setObjective(gp.quicksum(
-                (X[i, j] - gp.quicksum(X[i, k] * edges_weights[k, j] for k in range(d) if k != j)) ** 2 for i in
-                range(n) for j in range(d)) / n + lambda1 * reg / d, GRB.MINIMIZE)
-            print(m.getObjective().getValue())
+            loss = l2_loss_matrices(gram, d, (directed + bidirected) > 0, n)
     elif loss_type == 'l1':
-        abs_vars = {}
-        for i in range(n):
-            for j in range(d):
-                abs_vars[i, j] = m.addVar(vtype=GRB.CONTINUOUS, name=f'abs{i}-{j})')
-                m.addConstr((X[i, j] - gp.quicksum(X[i, k] * edges_weights[k, j] for k in range(d) if k != j)) <= abs_vars[i, j])
-                m.addConstr(-(X[i, j] - gp.quicksum(X[i, k] * edges_weights[k, j] for k in range(d) if k != j)) <= abs_vars[i, j])
-
-        abs_edges_weights = {}
-        for v1 in range(d):
-            for v2 in range(d):
-                if v1 != v2:
-                    abs_edges_weights[v1, v2] = m.addVar(vtype=GRB.CONTINUOUS, name=f'abs_weight{v1}->{v2}')
-                    m.addConstr(edges_weights[v1, v2] <= abs_edges_weights[v1, v2])
-                    m.addConstr(-edges_weights[v1, v2] <= abs_edges_weights[v1, v2])
-
-        m.setObjective(gp.quicksum(abs_vars[i, j] for i in range(n) for j in range(d)) + lambda1 * reg, GRB.MINIMIZE)
+        abs_vars = m.addMVar((n, d), vtype=GRB.CONTINUOUS, name='abs')
+        residuals = X - X @ edges_weights
+        m.addConstr(residuals <= abs_vars)
+        m.addConstr(-residuals <= abs_vars)
+
+        abs_edges_weights = m.addMVar((d, d), vtype=GRB.CONTINUOUS, name='abs_weight')
+        m.addConstr(edges_weights <= abs_edges_weights)
+        m.addConstr(-edges_weights <= abs_edges_weights)
+
+        loss = abs_vars.sum()
+        reg_scale = 1
+
+    if warm_start:
+        start_time = time.perf_counter()
+        start_edges, start_biedges, start_weights, start_objective = greedy_mag(gram, n, tabu_matrix, lambda1,
+                                                                                reg_type, candidates)
+        edges_vars.Start = start_edges
+        biedges_vars.Start = start_biedges
+        if constraints_mode == 'no-weights':
+            edges_weights.Start = start_edges + start_biedges
+        else:
+            edges_weights.Start = np.clip(start_weights, -weights_bound, weights_bound)
+        print(f'Heuristic MAG: {start_edges.sum()} directed and {start_biedges.sum() // 2} bidirected edges, '
+              f'l2 objective {start_objective:.6g}, found in {time.perf_counter() - start_time:.3f}s')
+
+    if cut_pool is None:
+        cut_pool = CutPool(d)
+    assert cut_pool.d == d, 'The cut pool is over a different number of variables'
+    cut_pool.add_constraints(m, edges_vars, biedges_vars, lazy=cut_pool_lazy)
+    m._cut_pool_lazy = cut_pool_lazy
+    m._cuts_in_model = len(cut_pool)
 
     m.Params.lazyConstraints = 1
     m.Params.MIPGap = 0.1
     m.params.TimeLimit = time_limit
+    if threads is not None:
+        m.Params.Threads = threads
     m._edges_vars = edges_vars
     m._biedges_vars = biedges_vars
     m._edges_weights = edges_weights
-    m._lazy_count = 0
-    m._last_time_stats = 0
+    m._loss = loss
+    m._reg = reg
+    m._reg_scale = reg_scale
+    m._reg_type = reg_type
+    m._lambda1 = lambda1
+    m._allowed = (directed + bidirected) > 0
     m._B_ref = B_ref
-    m._stats = []
+    m._reachability = ReachabilityCache()
+    m._cut_pool = cut_pool
     m._d = d
     m._callback_mode = mode
+    m._max_cycles = max_cycles
+    m._user_cuts = None
+    if user_cuts:
+        m.Params.PreCrush = 1
+        m._user_cuts = {'frequency': user_cuts_frequency, 'max_nodes': user_cuts_max_nodes,
+                        'max_cuts': user_cuts_per_node}
+    assert inducing_path_order in ('dfs', 'shortest'), f'Invalid inducing path order {inducing_path_order}'
+    m._inducing_path_options = {'max_length': inducing_path_max_length, 'max_paths': inducing_path_limit,
+                                'shortest_first': inducing_path_order == 'shortest'}
+    set_objective(m)
+    return m
+
+
+def set_objective(m):
+    """Sets the objective loss + lambda1 * reg_scale * reg of a model from build_model.
+
+    An l2 loss given by l2_loss_matrices is passed to setMObjective, which is several times faster than building the
+    quadratic expression for large d. The regularization is then added to the quadratic matrix (l2) or set as the
+    objective coefficients of the edge variables (l1).
+    """
+    reg_weight = m._lambda1 * m._reg_scale
+    if not isinstance(m._loss, tuple):
+        m.setObjective(m._loss + reg_weight * m._reg, GRB.MINIMIZE)
+        return
+    quad, lin, constant = m._loss
+    if m._reg_type == 'l2':
+        quad = quad + reg_weight * sp.identity(m._d * m._d)
+    w = m._edges_weights.reshape(-1)
+    m.setMObjective(quad, lin, constant, w, w, w, GRB.MINIMIZE)
+    if m._reg_type == 'l1':
+        m._edges_vars.Obj = np.full(m._edges_vars.shape, reg_weight)
+        m._biedges_vars.Obj = np.full(m._biedges_vars.shape, reg_weight)
+
+
+def set_lambda(m, lambda1):
+    """Changes the regularization weight of a model from build_model."""
+    m._lambda1 = lambda1
+    if m._reg_type == 'l1':  # the edge variables appear only in the regularization, update just their coefficients
+        m._edges_vars.Obj = np.full(m._edges_vars.shape, lambda1 * m._reg_scale)
+        m._biedges_vars.Obj = np.full(m._biedges_vars.shape, lambda1 * m._reg_scale)
+    else:
+        set_objective(m)
+
+
+def set_l2_loss(m, gram, n):
+    """Replaces the loss of a model from build_model with the l2 loss given by gram (see l2_loss_matrices) over n."""
+    m._loss = l2_loss_matrices(gram, m._d, m._allowed, n)
+    set_objective(m)
+
+
+def add_pool_cuts(m, lazy=0):
+    """Adds the cuts collected in the cut pool of a model from build_model since it was built or this was last called,
+    as ordinary constraints if lazy is 0, otherwise with that Lazy attribute value (see CutPool.add_constraints).
+
+    Gurobi drops the lazy constraints added by the callback when the model is optimized again, so this is called before
+    each further optimization of a changed model to keep the cuts found so far.
+    """
+    m._cut_pool.add_constraints(m, m._edges_vars, m._biedges_vars, lazy=lazy, start=m._cuts_in_model)
+    m._cuts_in_model = len(m._cut_pool)
+
+
+def optimize_model(m):
+    """Optimizes a model from build_model with the check_for_mag callback and reports the callback statistics, which
+    are set up anew for each optimization."""
+    m._lazy_count = 0
+    m._last_time_stats = 0
+    m._stats = []
+    m._suppressed_cuts = 0
+    m._profiler = CallbackProfiler()
+    m._user_cut_stats = {'separations': 0, 'cycle_cuts': 0, 'almost_directed_cycle_cuts': 0, 'first_bound': None,
+                         'last_bound': None}
     m.optimize(check_for_mag)
 
-    gap = m.MIPGap
-    lazy_count = m._lazy_count
-    stats = m._stats
+    cut_pool = m._cut_pool
+    reachability_stats = m._reachability.statistics()
+    print(f'Reachability cache: {reachability_stats["hits"]}/{reachability_stats["calls"]} incremental updates, '
+          f'estimated time saved {reachability_stats["time_saved"]:.3f}s')
+    print(f'Cut pool: {len(cut_pool)} cuts, {m._suppressed_cuts} duplicates suppressed')
+    if m._user_cuts is not None:
+        cut_stats = m._user_cut_stats
+        bound_improvement = (cut_stats['last_bound'] - cut_stats['first_bound']
+                             if cut_stats['first_bound'] is not None else 0.0)
+        print(f'User cuts: {cut_stats["cycle_cuts"]} cycle, {cut_stats["almost_directed_cycle_cuts"]} almost directed '
+              f'cycle in {cut_stats["separations"]} separations, bound improvement {bound_improvement:.6g}')
 
-    # print(f'add constraints: {callback_constraints[1]}')
 
-    edges_vals = tupledict_to_np_matrix(m.getAttr('x', edges_vars), d)
-    biedges_vals = tupledict_to_np_matrix(m.getAttr('x', biedges_vars), d)
-    weights_vals = m.getAttr('x', edges_weights)
+def extract_solution(m, w_threshold):
+    """Returns the weighted directed and bidirected adjacency matrices of the best solution of the model."""
+    edges_vals = m._edges_vars.X
+    biedges_vals = m._biedges_vars.X
+    weights_vals = m._edges_weights.X
 
-    W = extract_adj_matrix(edges_vals, weights_vals, d)
-    Wbi = extract_adj_matrix(biedges_vals, weights_vals, d)
+    W = extract_adj_matrix(edges_vals, weights_vals, m._d)
+    Wbi = extract_adj_matrix(biedges_vals, weights_vals, m._d)
 
     assert utils.is_dag(W)
-    m.dispose()
-    gp.disposeDefaultEnv()
 
     # threshold_func = np.vectorize(lambda x: (x if abs(x) > threshold else 0.0))
     # W_t = threshold_func(W)
 
     W[np.abs(W) < w_threshold] = 0
     Wbi[np.abs(Wbi) < w_threshold] = 0
+    return W, Wbi
+
+
+def allowed_components(candidates):
+    """Vertex sets of the connected components of the graph of pairs that may be adjacent in a MAG.
+
+    Every candidate pair (see candidates_matrix) allows either a directed (outside tabu) or a bidirected (inside tabu)
+    edge, so these are the components of the candidate pairs. There is no edge, no path and hence no cut between two
+    components, and both the loss and the regularization are sums over the columns, so each component can be solved on
+    its own.
+    """
+    allowed = np.asarray(candidates, dtype=bool) & ~np.eye(len(candidates), dtype=bool)
+    count, labels = connected_components(sp.csr_matrix(allowed), directed=False)
+    return [np.flatnonzero(labels == c) for c in range(count)]
+
+
+def _lower_pairs(matrix):
+    return list(zip(*(idx.tolist() for idx in np.nonzero(np.tril(matrix)))))
+
+
+def edges_as_indices(X, kwargs):
+    """Replaces the tabu_edges and forbidden_edges in the build_model keyword arguments kwargs (given by integers or
+    column names in X) by pairs of integers, so that X can be converted to an array or sampled."""
+    for key in ('tabu_edges', 'forbidden_edges'):
+        if kwargs.get(key):
+            kwargs[key] = _lower_pairs(pairs_matrix(X, kwargs[key]))
+
+
+def _solve_component(X, lambda1, loss_type, reg_type, w_threshold, kwargs):
+    start = time.perf_counter()
+    result = solve(X, lambda1, loss_type, reg_type, w_threshold, decompose=False, **kwargs)
+    return result + (time.perf_counter() - start,)
+
+
+def solve_components(X, components, lambda1, loss_type, reg_type, w_threshold, workers=1, parallel_min_size=10,
+                     **kwargs):
+    """Solves the problem separately on each of the given vertex sets, which must be the allowed_components, and
+    stitches the solutions together.
+
+    Components with a single vertex have no edges and are not solved. If workers > 1 and at least two components have
+    parallel_min_size or more vertices, those are solved in a pool of workers processes, each with Gurobi limited to
+    its share of the cores unless threads is given. Returns the same as solve (the largest gap, the total number of
+    lazy constraints, the concatenated statistics and, with profile, the merged profiles), followed by a list with the
+    vertices, runtime, gap and number of lazy constraints (and profile) of each solved component.
+    """
+    n, d = X.shape
+    tabu_matrix = pairs_matrix(X, kwargs.pop('tabu_edges', {}))
+    candidates = candidates_matrix(X, kwargs.pop('forbidden_edges', ()), kwargs.pop('candidates', None),
+                                   kwargs.pop('screening_k', None), kwargs.pop('screening_threshold', None))
+    B_ref = kwargs.pop('B_ref', None)
+
+    tasks = []
+    for component in components:
+        if len(component) < 2:
+            continue
+        sub_kwargs = dict(kwargs)
+        block = np.ix_(component, component)
+        sub_kwargs['tabu_edges'] = _lower_pairs(tabu_matrix[block])
+        sub_kwargs['candidates'] = candidates[block]
+        sub_kwargs['B_ref'] = None if B_ref is None else B_ref[block]
+        # the l2 loss scales the regularization by 1 / d, keep the weight it has in the whole problem
+        sub_lambda = lambda1 * len(component) / d if loss_type == 'l2' else lambda1
+        tasks.append((component, (select_columns(X, component), sub_lambda, loss_type, reg_type, w_threshold,
+                                  sub_kwargs)))
+
+    parallel = [task for task in tasks if len(task[0]) >= parallel_min_size]
+    if workers <= 1 or len(parallel) < 2:
+        parallel = []
+    results = {}
+    if parallel:
+        threads = kwargs.get('threads') or max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for component, (X_c, lam, *args, sub_kwargs) in parallel:
+                futures[executor.submit(_solve_component, X_c, lam, *args, {**sub_kwargs, 'threads': threads})] = \
+                    tuple(component)
+            for future, key in futures.items():
+                results[key] = future.result()
+    for component, args in tasks:
+        if tuple(component) not in results:
+            results[tuple(component)] = _solve_component(*args)
+
+    W = np.zeros((d, d))
+    Wbi = np.zeros((d, d))
+    gap, lazy_count, stats, component_results = 0.0, 0, [], []
+    for component, _ in tasks:
+        W_c, Wbi_c, gap_c, lazy_c, stats_c, *profile_c, runtime = results[tuple(component)]
+        block = np.ix_(component, component)
+        W[block] = W_c
+        Wbi[block] = Wbi_c
+        gap = max(gap, gap_c)
+        lazy_count += lazy_c
+        stats.extend(stats_c)
+        component_results.append({'vertices': component.tolist(), 'runtime': runtime, 'gap': gap_c,
+                                  'lazy_count': lazy_c})
+        if profile_c:
+            component_results[-1]['profile'] = profile_c[0]
+    if kwargs.get('profile'):
+        return W, Wbi, gap, lazy_count, stats, merge_records([c['profile'] for c in component_results]), \
+            component_results
+    return W, Wbi, gap, lazy_count, stats, component_results
+
+
+def solve(X, lambda1, loss_type, reg_type, w_threshold, tabu_edges={}, B_ref=None, mode='shortest_cycle',
+          time_limit=300, robust=False, weights_bound=100.0, constraints_mode='weights', *, decompose=True, workers=1,
+          l1_method='exact', l1_sample_size=1000, l1_iterations=5, robust_iterations=10, profile=False, **kwargs):
+    """Learns a MAG from the data X, see build_model for the model arguments. For the l2 loss, X can also be the
+    SufficientStatistics of the data. The arguments after constraints_mode are keyword-only.
+
+    The exact l1 loss needs n * d variables and 2 * n * d constraints. With l1_method 'sample', it is computed over a
+    uniform sample of l1_sample_size rows only (with lambda1 scaled accordingly); with 'irls', it is approximated by
+    l1_iterations rounds of reweighted l2 losses, whose size does not depend on n (see reweighting.solve_irls).
+
+    With robust='trimmed' (and the l2 loss), the robust mode of build_model is approximated by at most
+    robust_iterations rounds of trimmed least squares, keeping the robust_fraction of the rows with the smallest
+    residuals (see reweighting.solve_trimmed).
+
+    With decompose, if the forbidden edges and candidates split the variables into several allowed_components, each
+    of them is solved as its own model by solve_components (with the given number of worker processes), unless the
+    robust mode or a cut pool over all the variables is used.
+
+    Returns the weighted directed and bidirected adjacency matrices (weights below w_threshold set to zero), the MIP
+    gap, the number of lazy constraints and the statistics collected by the callback. With profile, these are
+    followed by the record of the profiling.CallbackProfiler (merged over the components or iterations, see
+    profiling.merge_records), which can be saved by profiling.write_json or profiling.log_mlflow.
+    """
+    kwargs.update(tabu_edges=tabu_edges, B_ref=B_ref, mode=mode, time_limit=time_limit, robust=robust,
+                  weights_bound=weights_bound, constraints_mode=constraints_mode)
+    if loss_type == 'l1' and l1_method != 'exact':
+        edges_as_indices(X, kwargs)
+        n = len(X)
+        if l1_method == 'sample':
+            if n > l1_sample_size:
+                rows = np.sort(np.random.choice(n, size=l1_sample_size, replace=False))
+                X = np.asarray(X, dtype=float)[rows]
+                lambda1 = lambda1 * l1_sample_size / n
+        elif l1_method == 'irls':
+            from dagsolvers.reweighting import solve_irls
+            return solve_irls(X, lambda1, reg_type, w_threshold, iterations=l1_iterations, profile=profile, **kwargs)
+        else:
+            assert False, f'Invalid l1 method {l1_method}'
+
+    if kwargs.get('robust') == 'trimmed':
+        assert loss_type == 'l2', 'The trimmed robust mode is implemented for the l2 loss only'
+        from dagsolvers.reweighting import solve_trimmed
+        kwargs.pop('robust')
+        return solve_trimmed(X, lambda1, reg_type, w_threshold, fraction=kwargs.pop('robust_fraction', 0.9),
+                             iterations=robust_iterations, profile=profile, **kwargs)
+
+    if decompose and not kwargs.get('robust') and kwargs.get('cut_pool') is None:
+        candidates = candidates_matrix(X, kwargs.get('forbidden_edges', ()), kwargs.get('candidates'),
+                                       kwargs.get('screening_k'), kwargs.get('screening_threshold'))
+        components = allowed_components(candidates)
+        if len(components) > 1:
+            *result, component_results = solve_components(X, components, lambda1, loss_type, reg_type, w_threshold,
+                                                          workers=workers, profile=profile, **kwargs)
+            for i, component in enumerate(component_results):
+                print(f'Component {i}: {len(component["vertices"])} vertices, solved in {component["runtime"]:.3f}s, '
+                      f'gap {component["gap"]:.4f}, {component["lazy_count"]} lazy constraints')
+            return tuple(result)
+
+    m = build_model(X, lambda1, loss_type, reg_type, **kwargs)
+    optimize_model(m)
+
+    gap = m.MIPGap
+    lazy_count = m._lazy_count
+    stats = m._stats
+    record = m._profiler.record(m)
+    W, Wbi = extract_solution(m, w_threshold)
+    m.dispose()
+    gp.disposeDefaultEnv()
 
+    if profile:
+        return W, Wbi, gap, lazy_count, stats, record
     return W, Wbi, gap, lazy_count, stats
 
 
@@ -0,0 +1,131 @@
+import csv
+import itertools
+
+import numpy as np
+
+
+class SufficientStatistics:
+    """Number of samples n, column sums and Gram matrix X^T X of the data added so far.
+
+    These are all the l2 loss of solve() needs, so the data can be added chunk by chunk from files that do not fit into
+    memory, with memory O(d^2) independently of the number of rows, and new data appended later without reading the
+    old again. An instance can be passed to solve() (and build_model) in place of X; columns optionally holds the
+    column names, which can then be used in tabu and forbidden edges.
+    """
+
+    def __init__(self, d=None, columns=None):
+        self.n = 0
+        self.sums = None if d is None else np.zeros(d)
+        self.gram = None if d is None else np.zeros((d, d))
+        self.columns = columns
+
+    @property
+    def shape(self):
+        return self.n, len(self.sums)
+
+    @property
+    def mean(self):
+        return self.sums / self.n
+
+    def update(self, chunk):
+        """Adds the rows of the (rows, d) array chunk."""
+        chunk = np.asarray(chunk, dtype=float)
+        if self.gram is None:
+            self.sums = np.zeros(chunk.shape[1])
+            self.gram = np.zeros((chunk.shape[1], chunk.shape[1]))
+        assert chunk.shape[1] == len(self.sums), f'Expected {len(self.sums)} columns, got {chunk.shape[1]}'
+        self.n += len(chunk)
+        self.sums += chunk.sum(axis=0)
+        self.gram += chunk.T @ chunk
+        return self
+
+    def add_array(self, X, chunk_rows=100000):
+        for start in range(0, len(X), chunk_rows):
+            self.update(X[start:start + chunk_rows])
+        return self
+
+    def add_npy(self, path, chunk_rows=100000):
+        """Adds the rows of a 2-D .npy file, memory-mapped and read chunk_rows rows at a time."""
+        return self.add_array(np.load(path, mmap_mode='r'), chunk_rows)
+
+    def add_csv(self, path, chunk_rows=100000, delimiter=',', header=False):
+        """Adds the rows of a CSV file of numbers, read chunk_rows rows at a time. With header, the first line holds
+        the column names."""
+        with open(path, newline='') as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            if header:
+                columns = next(reader)
+                if self.columns is None:
+                    self.columns = columns
+            while True:
+                rows = list(itertools.islice(reader, chunk_rows))
+                if not rows:
+                    break
+                self.update(np.array(rows, dtype=float))
+        return self
+
+    def add_parquet(self, path, chunk_rows=100000, columns=None):
+        """Adds the rows of a Parquet file (of the given columns, all by default), read in batches of chunk_rows rows.
+        Requires pyarrow."""
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        if self.columns is None:
+            self.columns = columns if columns is not None else parquet_file.schema_arrow.names
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            self.update(np.column_stack([column.to_numpy(zero_copy_only=False) for column in batch.columns]))
+        return self
+
+    def centered(self):
+        """Statistics of the data with the column means subtracted."""
+        centered = SufficientStatistics(columns=self.columns)
+        centered.n = self.n
+        centered.sums = np.zeros_like(self.sums)
+        centered.gram = self.gram - self.n * np.outer(self.mean, self.mean)
+        return centered
+
+    def subset(self, columns):
+        """Statistics of the given columns (indices) only."""
+        columns = np.asarray(columns)
+        subset = SufficientStatistics(columns=None if self.columns is None else [self.columns[c] for c in columns])
+        subset.n = self.n
+        subset.sums = self.sums[columns]
+        subset.gram = self.gram[np.ix_(columns, columns)]
+        return subset
+
+    def save(self, path):
+        np.savez(path, n=self.n, sums=self.sums, gram=self.gram,
+                 columns=np.array([] if self.columns is None else self.columns, dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            statistics = cls(columns=data['columns'].tolist() or None)
+            statistics.n = int(data['n'])
+            statistics.sums = data['sums']
+            statistics.gram = data['gram']
+        return statistics
+
+
+def gram_matrix(X):
+    """X^T X of a data matrix or of SufficientStatistics."""
+    if isinstance(X, SufficientStatistics):
+        return X.gram
+    X = np.asarray(X, dtype=float)
+    return X.T @ X
+
+
+def weighted_gram(X, weights):
+    """X^T diag(weights) X for (n,) row weights, or the (d, d, d) stack of X^T diag(weights[:, j]) X over the columns
+    j for (n, d) weights of the individual entries."""
+    X = np.asarray(X, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    if weights.ndim == 1:
+        return (X * weights[:, np.newaxis]).T @ X
+    return np.stack([(X * weights[:, j, np.newaxis]).T @ X for j in range(X.shape[1])])
+
+
+def select_columns(X, columns):
+    """The given columns (indices) of a data matrix or of SufficientStatistics."""
+    if isinstance(X, SufficientStatistics):
+        return X.subset(columns)
+    return np.asarray(X, dtype=float)[:, columns]
@@ -1,4 +1,5 @@
 import numpy as np
+import scipy.sparse as sp
 from scipy.special import expit as sigmoid
 import igraph as ig
 import random
@@ -9,9 +10,50 @@ def set_random_seed(seed):
     np.random.seed(seed)
 
 
+def topological_order(W):
+    """Topological order of the graph with the edges W[i, j] != 0, or None if it has a cycle.
+
+    W is a dense [d, d] array or a scipy.sparse matrix. Kahn's algorithm processes all the vertices freed by one layer
+    at once on in-degree vectors, in the order of igraph's topological_sorting (first-in first-out: by the position of
+    the parent whose removal freed the vertex, then by index), so the simulations below draw their noise in the same
+    order as with igraph.
+    """
+    d = W.shape[0]
+    if sp.issparse(W):
+        adj = sp.csr_matrix(W, copy=True)
+        adj.eliminate_zeros()
+        in_degree = np.bincount(adj.indices, minlength=d)
+    else:
+        adj = np.asarray(W) != 0
+        in_degree = adj.sum(axis=0)
+    remaining = np.ones(d, dtype=bool)
+    layer = np.flatnonzero(in_degree == 0)
+    order = []
+    while len(layer):
+        order.append(layer)
+        remaining[layer] = False
+        # the edges out of the layer, as the children and the (1-based) positions of their parents in the layer
+        if sp.issparse(adj):
+            lengths = adj.indptr[layer + 1] - adj.indptr[layer]
+            offsets = np.repeat(adj.indptr[layer] - np.cumsum(lengths) + lengths, lengths)
+            children = adj.indices[offsets + np.arange(lengths.sum())]
+            ranks = np.repeat(np.arange(1, len(layer) + 1), lengths)
+        else:
+            ranks, children = np.nonzero(adj[layer])
+            ranks += 1
+        in_degree = in_degree - np.bincount(children, minlength=d)
+        freed = np.flatnonzero((in_degree == 0) & remaining)
+        last_parent = np.zeros(d, dtype=int)
+        np.maximum.at(last_parent, children, ranks)
+        layer = freed[np.lexsort((freed, last_parent[freed]))]
+    if remaining.any():
+        return None
+    return np.concatenate(order) if order else np.zeros(0, dtype=int)
+
+
 def is_dag(W):
-    G = ig.Graph.Weighted_Adjacency(W.tolist())
-    return G.is_dag()
+    """Whether the graph with the edges W[i, j] != 0 (a dense array or a scipy.sparse matrix) is acyclic."""
+    return topological_order(W) is not None
 
 
 def simulate_dag(d, s0, graph_type):
@@ -57,7 +99,7 @@ def simulate_dag(d, s0, graph_type):
         for v in range(d-1):
             G.add_edge(v, v + 1)
         B = _graph_to_adjmat(G)
-        assert ig.Graph.Adjacency(B.tolist()).is_dag()
+        assert is_dag(B)
         return B
     elif graph_type == 'PATHPERM':
         # Path graph for generating counter examples
@@ -75,7 +117,7 @@ def simulate_dag(d, s0, graph_type):
     else:
         raise ValueError('unknown graph type')
     B_perm = _random_permutation(B)
-    assert ig.Graph.Adjacency(B_perm.tolist()).is_dag()
+    assert is_dag(B_perm)
     return B_perm
 
 
@@ -154,16 +196,80 @@ def simulate_linear_sem(W, n, sem_type, noise_scale=None):
         else:
             raise ValueError('population risk not available')
     # empirical risk
-    G = ig.Graph.Weighted_Adjacency(W.tolist())
-    ordered_vertices = G.topological_sorting()
-    assert len(ordered_vertices) == d
+    ordered_vertices = topological_order(W)
     X = np.zeros([n, d])
     for j in ordered_vertices:
-        parents = G.neighbors(j, mode=ig.IN)
+        parents = np.flatnonzero(W[:, j])
         X[:, j] = _simulate_single_equation(X[:, parents], W[parents, j], scale_vec[j])
     return X
 
 
+def simulate_linear_sem_batch(W, n, sem_type, replicates, noise_scale=None, seed=None, path=None):
+    """Simulate replicates of samples from a linear SEM at once.
+
+    For the additive noise types, all the noise of a replicate is drawn at once and X = Z (I - W)^-1 with the
+    inverse computed once for all the replicates; logistic and poisson are simulated node by node in topological
+    order, as in simulate_linear_sem. Each replicate has its own random generator, so it can be reproduced on its own.
+
+    Args:
+        W (np.ndarray): [d, d] weighted adj matrix of DAG
+        n (int): num of samples per replicate
+        sem_type (str): gauss, exp, gumbel, uniform, logistic, poisson
+        replicates (int): num of replicates
+        noise_scale (np.ndarray): scale parameter of additive noise, default all ones
+        seed (int or list): seed spawning the seeds of the replicates, or a list of replicates seeds (replicate r with
+            seed [s] in place of a list with s at position r gives the same data)
+        path (str): if given, the replicates are written one by one into a memory-mapped .npy file at path
+
+    Returns:
+        X (np.ndarray): [replicates, n, d] sample matrices, memory-mapped if path is given
+    """
+    d = W.shape[0]
+    scale_vec = np.ones(d) if noise_scale is None else np.broadcast_to(np.asarray(noise_scale, dtype=float), (d,))
+    ordered_vertices = topological_order(W)
+    if ordered_vertices is None:
+        raise ValueError('W must be a DAG')
+    if sem_type not in ('gauss', 'exp', 'gumbel', 'uniform', 'logistic', 'poisson'):
+        raise ValueError('unknown sem type')
+    if seed is None or np.isscalar(seed):
+        generators = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(replicates)]
+    else:
+        if len(seed) != replicates:
+            raise ValueError('seed must be a scalar or have length replicates')
+        generators = [np.random.default_rng(s) for s in seed]
+
+    if path is None:
+        X = np.zeros([replicates, n, d])
+    else:
+        X = np.lib.format.open_memmap(path, mode='w+', dtype=float, shape=(replicates, n, d))
+    if sem_type in ('logistic', 'poisson'):
+        for r, rng in enumerate(generators):
+            X_r = np.zeros([n, d])
+            for j in ordered_vertices:
+                parents = np.flatnonzero(W[:, j])
+                logits = X_r[:, parents] @ W[parents, j]
+                if sem_type == 'logistic':
+                    X_r[:, j] = rng.binomial(1, sigmoid(logits))
+                else:
+                    X_r[:, j] = rng.poisson(np.exp(logits))
+            X[r] = X_r
+    else:
+        inverse = np.linalg.inv(np.eye(d) - W)
+        for r, rng in enumerate(generators):
+            if sem_type == 'gauss':
+                Z = rng.normal(scale=scale_vec, size=(n, d))
+            elif sem_type == 'exp':
+                Z = rng.exponential(scale=scale_vec, size=(n, d))
+            elif sem_type == 'gumbel':
+                Z = rng.gumbel(scale=scale_vec, size=(n, d))
+            else:
+                Z = rng.uniform(low=-scale_vec, high=scale_vec, size=(n, d))
+            X[r] = Z @ inverse
+    if path is not None:
+        X.flush()
+    return X
+
+
 def simulate_nonlinear_sem(B, n, sem_type, noise_scale=None):
     """Simulate samples from nonlinear SEM.
 
@@ -213,11 +319,10 @@ def simulate_nonlinear_sem(B, n, sem_type, noise_scale=None):
     d = B.shape[0]
     scale_vec = noise_scale if noise_scale else np.ones(d)
     X = np.zeros([n, d])
-    G = ig.Graph.Adjacency(B.tolist())
-    ordered_vertices = G.topological_sorting()
-    assert len(ordered_vertices) == d
+    ordered_vertices = topological_order(B)
+    assert ordered_vertices is not None
     for j in ordered_vertices:
-        parents = G.neighbors(j, mode=ig.IN)
+        parents = np.flatnonzero(B[:, j])
         X[:, j] = _simulate_single_equation(X[:, parents], scale_vec[j])
     return X
 
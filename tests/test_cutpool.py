@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from dagsolvers.cutpool import CutPool
+from dagsolvers.solve_exmag import build_model, optimize_model, set_lambda, solve
+import notears.utils as utils
+
+
+class TestCutPool(unittest.TestCase):
+
+    def test_canonical_keys(self):
+        pool = CutPool(4)
+        self.assertTrue(pool.add([(0, 1), (1, 2)], [(3, 0)]))
+        self.assertFalse(pool.add([(1, 2), (0, 1)], [(0, 3)]))
+        self.assertTrue(pool.add([(0, 1), (1, 2)], []))
+        self.assertIn(([(1, 2), (0, 1)], [(0, 3)]), pool)
+        self.assertEqual(len(pool), 2)
+
+    def test_save_load(self):
+        pool = CutPool(4, [([(0, 1), (1, 2), (2, 0)], []), ([(np.int64(1), np.int64(3))], [(3, 2)])])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cuts.json')
+            pool.save(path)
+            loaded = CutPool.load(path)
+        self.assertEqual(loaded.d, 4)
+        self.assertEqual(list(loaded), list(pool))
+
+    def test_reuse_across_solves(self):
+        utils.set_random_seed(0)
+        B_true = utils.simulate_dag(5, 8, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), 100, 'gauss')
+        pool = CutPool(5)
+        W, _, _, lazy_count, _ = solve(X, lambda1=0.1, loss_type='l2', reg_type='l1', w_threshold=0,
+                                       tabu_edges=[(0, 1)], cut_pool=pool)
+        self.assertEqual(len(pool), lazy_count)
+        self.assertTrue(utils.is_dag(W))
+
+        cuts_before = len(pool)
+        W, _, _, _, _ = solve(X, lambda1=0.1, loss_type='l2', reg_type='l1', w_threshold=0, tabu_edges=[(0, 1)],
+                              cut_pool=pool, cut_pool_lazy=0)
+        self.assertGreaterEqual(len(pool), cuts_before)
+        self.assertTrue(utils.is_dag(W))
+
+    def test_cuts_over_excluded_edges(self):
+        X = np.random.default_rng(0).normal(size=(30, 4))
+        # only the pair (0, 1) can be bidirected, so the first cut always holds
+        pool = CutPool(4, [([(1, 0)], [(0, 2)]), ([(1, 2)], [(0, 1)])])
+        for compact_bidirected in (True, False):
+            m = build_model(X, 0.1, 'l2', 'l1', tabu_edges=[(0, 1)], cut_pool=pool,
+                            compact_bidirected=compact_bidirected)
+            self.assertEqual(len(pool.add_constraints(m, m._edges_vars, m._biedges_vars)), 1)
+            m.dispose()
+
+    def test_statistics_reset_per_optimization(self):
+        utils.set_random_seed(0)
+        X = utils.simulate_linear_sem(utils.simulate_parameter(utils.simulate_dag(4, 5, 'ER')), 50, 'gauss')
+        m = build_model(X, 0.1, 'l2', 'l1', user_cuts=True)
+        optimize_model(m)
+        m._suppressed_cuts += 100
+        m._user_cut_stats['separations'] += 100
+        set_lambda(m, 0.1)
+        m.reset()
+        optimize_model(m)
+        self.assertLess(m._suppressed_cuts, 100)
+        self.assertLess(m._user_cut_stats['separations'], 100)
+        m.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
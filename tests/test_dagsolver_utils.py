@@ -0,0 +1,119 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from dagsolvers.dagsolver_utils import apply_threshold, calculate_dag_shd, calculate_dag_shd_batch, \
+    find_minimal_dag_threshold, find_optimal_threshold_for_shd
+import notears.utils as utils
+
+
+def random_estimate(rng, d, density=0.4):
+    W = rng.normal(size=(d, d)) * (rng.random((d, d)) < density)
+    np.fill_diagonal(W, 0)
+    # bidirected weights in one direction only, as calculate_dag_shd rejects symmetric undirected edges
+    W_bi = np.triu(rng.normal(size=(d, d)) * (rng.random((d, d)) < density / 2), 1)
+    W_bi[(W != 0) | (W.T != 0)] = 0
+    return W, W_bi
+
+
+def shd_by_thresholding(B_true, W_est, A_true, A_est, W_bi_true, W_bi_est, t):
+    B_all_true = B_true - (W_bi_true != 0)
+    B_all_est = (apply_threshold(W_est, t) != 0) + (-1 * (apply_threshold(W_bi_est, t) != 0))
+    shd = calculate_dag_shd(B_all_true, B_all_est, test_dag=False)
+    for A_i_true, A_i_est in zip(A_true, A_est):
+        shd += calculate_dag_shd(A_i_true != 0, apply_threshold(A_i_est, t) != 0, test_dag=False)
+    return shd
+
+
+def shd_by_pairs(B_true, B_est):
+    shd = 0
+    for i in range(B_true.shape[0]):
+        for j in range(i):
+            e_ij = (B_est[i, j], B_est[j, i])
+            if min(e_ij) == -1:
+                e_ij = (-1, -1)
+            t_ij = (B_true[i, j], B_true[j, i])
+            if min(t_ij) == -1:
+                t_ij = (-1, -1)
+            if e_ij != t_ij:
+                if e_ij == t_ij[::-1]:
+                    shd += 0.5
+                elif (e_ij == (-1, -1) and t_ij == (0, 0)) or (e_ij == (0, 0) and t_ij == (-1, -1)):
+                    shd += 1
+                elif e_ij == (-1, -1) or t_ij == (-1, -1):
+                    shd += 0.5
+                else:
+                    shd += 1
+    return shd
+
+
+class TestShd(unittest.TestCase):
+
+    def test_matches_pairwise_comparison(self):
+        rng = np.random.default_rng(1)
+        B_true = rng.choice([0, 1, -1], p=[0.6, 0.3, 0.1], size=(7, 7))
+        B_ests = []
+        for _ in range(20):
+            W, W_bi = random_estimate(rng, 7)
+            B_est = (W != 0).astype(int) - (W_bi != 0)
+            self.assertEqual(calculate_dag_shd(B_true, B_est, test_dag=False), shd_by_pairs(B_true, B_est))
+            B_ests.append(B_est)
+        npt.assert_array_equal(calculate_dag_shd_batch(B_true, B_ests, test_dag=False),
+                               [shd_by_pairs(B_true, B_est) for B_est in B_ests])
+
+    def test_checks_estimate(self):
+        B_true = np.zeros((3, 3))
+        with self.assertRaises(ValueError):
+            calculate_dag_shd(B_true, np.array([[0, 1, 0], [0, 0, 1], [1, 0, 0]]))
+        with self.assertRaises(ValueError):
+            calculate_dag_shd_batch(B_true, [np.zeros((3, 3)), np.array([[0, -1, 0], [-1, 0, 0], [0, 0, 0]])])
+        self.assertEqual(calculate_dag_shd(B_true, np.array([[0, 1, 0], [0, 0, 1], [1, 0, 0]]), test_dag=False), 3)
+
+
+class TestOptimalThreshold(unittest.TestCase):
+
+    def test_sweep_matches_thresholding(self):
+        rng = np.random.default_rng(0)
+        for d in (3, 5, 9):
+            for _ in range(10):
+                utils.set_random_seed(int(rng.integers(1000)))
+                B_true = utils.simulate_dag(d, d, 'ER').astype(int)
+                W_bi_true = np.triu(rng.random((d, d)) < 0.2, 1) & (B_true == 0) & (B_true.T == 0)
+                W_est, W_bi_est = random_estimate(rng, d)
+                A_true = [rng.random((d, d)) < 0.2]
+                A_est = [rng.normal(size=(d, d)) * (rng.random((d, d)) < 0.3)]
+                best_t, best_shd, (thresholds, curve) = find_optimal_threshold_for_shd(
+                    B_true, W_est, A_true, A_est, W_bi_true, W_bi_est, return_curve=True)
+                expected = [shd_by_thresholding(B_true, W_est, A_true, A_est, W_bi_true, W_bi_est, t)
+                            for t in thresholds]
+                npt.assert_array_equal(curve, expected)
+                self.assertEqual(best_shd, min(expected))
+                self.assertEqual(best_shd, shd_by_thresholding(B_true, W_est, A_true, A_est, W_bi_true, W_bi_est,
+                                                               best_t))
+
+    def test_empty_estimate(self):
+        B_true = np.array([[0, 1], [0, 0]])
+        best_t, best_shd = find_optimal_threshold_for_shd(B_true, np.zeros((2, 2)), [], [], np.zeros((2, 2)),
+                                                          np.zeros((2, 2)))
+        self.assertEqual((best_t, best_shd), (0, 1))
+
+
+class TestMinimalDagThreshold(unittest.TestCase):
+
+    def test_matches_linear_search(self):
+        rng = np.random.default_rng(0)
+        for d in (2, 4, 8, 15):
+            for density in (0.2, 0.5, 1.0):
+                W = rng.normal(size=(d, d)) * (rng.random((d, d)) < density)
+                np.fill_diagonal(W, 0)
+                W_copy = W.copy()
+                t, W_t = find_minimal_dag_threshold(W)
+                npt.assert_array_equal(W, W_copy)
+                expected = next(t for t in [0] + sorted(np.abs(W[W != 0])) if utils.is_dag(apply_threshold(W, t)))
+                self.assertEqual(t, expected)
+                npt.assert_array_equal(W_t, apply_threshold(W, expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
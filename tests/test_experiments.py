@@ -0,0 +1,34 @@
+import json
+import os
+import tempfile
+import unittest
+
+from dagsolvers.experiments import expand_grid, run_grid, JsonLinesWriter
+
+
+class TestExperiments(unittest.TestCase):
+
+    def test_expand_grid(self):
+        configs = expand_grid({'d': [5, 6], 'lambda1': [0.1, 0.2, 0.3], 'seed': [0]})
+        self.assertEqual(len(configs), 6)
+        self.assertEqual({(c['d'], c['lambda1']) for c in configs}, {(d, l) for d in (5, 6) for l in (0.1, 0.2, 0.3)})
+        self.assertTrue(all(c['graph_type'] == 'ER' for c in configs))
+
+    def test_run_grid(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.jsonl')
+            writer = JsonLinesWriter(path)
+            results = run_grid({'d': [5], 'n': [100], 'seed': [0, 1]}, [writer], workers=2, threads=1)
+            writer.close()
+            with open(path) as f:
+                written = [json.loads(line) for line in f]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(sorted(r['seed'] for r in written), [0, 1])
+        for result in written:
+            self.assertNotIn('error', result)
+            self.assertIn('shd', result)
+            self.assertIn('lazy_count', result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from dagsolvers.dagsolver_utils import least_square_cost
+from dagsolvers.heuristic import ColumnRegressions, greedy_mag
+from dagsolvers.magseparation import floyd_warshall, check_for_almost_directed_cycles, check_for_inducing_path
+import notears.utils as utils
+
+
+class TestHeuristic(unittest.TestCase):
+
+    def test_greedy_mag_is_valid(self):
+        utils.set_random_seed(0)
+        d, n = 8, 200
+        B_true = utils.simulate_dag(d, 12, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), n, 'gauss')
+        # hide the vertex with most children, two of them can then be connected only by a bidirected edge
+        hidden = np.argmax(B_true.sum(axis=1))
+        observed = [v for v in range(d) if v != hidden]
+        u, v = np.flatnonzero(B_true[hidden])[:2]
+        tabu_matrix = np.zeros((d, d), dtype=int)
+        tabu_matrix[u, v] = tabu_matrix[v, u] = 1
+        X = X[:, observed]
+        tabu_matrix = tabu_matrix[np.ix_(observed, observed)]
+
+        edges, biedges, W, objective = greedy_mag(X.T @ X, n, tabu_matrix, lambda1=0.1)
+        self.assertTrue(utils.is_dag(edges))
+        self.assertFalse((edges & tabu_matrix).any())
+        self.assertFalse((biedges & (1 - tabu_matrix)).any())
+        fwdist = floyd_warshall(edges)
+        self.assertEqual(check_for_almost_directed_cycles(edges, biedges, fwdist), [])
+        self.assertEqual(check_for_inducing_path(edges, biedges, fwdist), [])
+        self.assertFalse((W[(edges + biedges) == 0] != 0).any())
+        expected = least_square_cost(X, W) / n + 0.1 * (edges.sum() + biedges.sum()) / (d - 1)
+        self.assertAlmostEqual(objective, expected)
+
+    def test_greedy_mag_adds_bidirected_edge(self):
+        rng = np.random.default_rng(0)
+        n = 500
+        hidden = rng.normal(size=n)
+        X = np.column_stack([hidden + 0.3 * rng.normal(size=n), -hidden + 0.3 * rng.normal(size=n), rng.normal(size=n)])
+        tabu_matrix = np.array([[0, 1, 0],
+                                [1, 0, 0],
+                                [0, 0, 0]])
+        edges, biedges, W, _ = greedy_mag(X.T @ X, n, tabu_matrix, lambda1=0.1)
+        np.testing.assert_array_equal(biedges, tabu_matrix)
+        self.assertEqual(edges.sum(), 0)
+        self.assertLess(W[0, 1], 0)
+        self.assertLess(W[1, 0], 0)
+
+
+    def test_regressions_match_least_squares(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(100, 6))
+        X[:, 5] = X[:, 0] - X[:, 1]
+        gram = X.T @ X
+        regressions = ColumnRegressions(gram)
+        for k, j in [(0, 2), (1, 2), (5, 2), (3, 2), (2, 4)]:
+            regressions.add_parent(k, j)
+        for j in range(6):
+            parents = np.flatnonzero(regressions.parents[:, j])
+            residuals = X[:, j] - X[:, parents] @ np.linalg.lstsq(X[:, parents], X[:, j], rcond=None)[0] \
+                if len(parents) else X[:, j]
+            self.assertAlmostEqual(regressions.residuals[j], residuals @ residuals)
+            for k in set(range(6)) - set(parents) - {j}:
+                with_k = np.append(parents, k)
+                coefficients = np.linalg.lstsq(X[:, with_k], X[:, j], rcond=None)[0]
+                gain = residuals @ residuals - np.sum((X[:, j] - X[:, with_k] @ coefficients) ** 2)
+                self.assertAlmostEqual(regressions.gains[k, j], gain, places=6)
+
+    def test_greedy_mag_stops_at_noise(self):
+        utils.set_random_seed(0)
+        d, n = 30, 1000
+        B_true = utils.simulate_dag(d, 2 * d, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), n, 'gauss')
+        edges, _, _, _ = greedy_mag(X.T @ X, n, np.zeros((d, d), dtype=int), lambda1=0.0)
+        self.assertLess(edges.sum(), 1.5 * B_true.sum())
+        edges, _, _, _ = greedy_mag(X.T @ X, n, np.zeros((d, d), dtype=int), lambda1=0.0, max_parents=1)
+        self.assertLessEqual(edges.sum(axis=0).max(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
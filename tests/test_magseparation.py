@@ -65,6 +65,56 @@ class TestMAGSeaparator(unittest.TestCase):
     def test_floyd_warshall(self, adj, fwdist):
         npt.assert_array_equal(floyd_warshall(adj), fwdist)
 
+    @parameterized.expand([
+        (GRAPH_1_EDG, GRAPH_1_FW),
+        (GRAPH_2_EDG, GRAPH_2_FW),
+        (GRAPH_3_EDG, GRAPH_3_FW),
+        (GRAPH_4_EDG, GRAPH_4_FW)
+    ])
+    def test_transitive_closure(self, adj, fwdist):
+        npt.assert_array_equal(transitive_closure(adj), np.isfinite(fwdist))
+
+    def test_floyd_warshall_random(self):
+        rng = np.random.default_rng(0)
+        adj = (rng.random((30, 30)) < 0.08).astype(int)
+        np.fill_diagonal(adj, 0)
+        dist = floyd_warshall(adj)
+        # distances satisfy the Bellman equations: dist[i, j] = 1 + min over successors k of i of dist[k, j]
+        for i in range(30):
+            successors = np.flatnonzero(adj[i])
+            expected = np.min(dist[successors], axis=0) + 1 if len(successors) else np.full(30, np.inf)
+            expected[i] = 0
+            npt.assert_array_equal(dist[i], expected)
+        npt.assert_array_equal(transitive_closure(adj), np.isfinite(dist))
+
+    def test_reachability_cache(self):
+        rng = np.random.default_rng(1)
+        cache = ReachabilityCache(max_changes=4)
+        adj = (rng.random((25, 25)) < 0.1).astype(float)
+        np.fill_diagonal(adj, 0)
+        for _ in range(30):
+            npt.assert_array_equal(cache.distances(adj), floyd_warshall(adj))
+            flips = rng.integers(0, 25, size=(rng.integers(1, 7), 2))
+            for i, j in flips:
+                if i != j:
+                    adj[i, j] = 1 - adj[i, j]
+        stats = cache.statistics()
+        self.assertEqual(stats['calls'], 30)
+        self.assertGreater(stats['hits'], 0)
+        self.assertGreater(stats['calls'], stats['hits'])
+
+    def test_reachability_cache_high_in_degree(self):
+        # vertex 258 has 257 parents, all children of vertex 0
+        adj = np.zeros((300, 300))
+        adj[0, 1:258] = 1
+        adj[1:258, 258] = 1
+        cache = ReachabilityCache()
+        cache.distances(adj)
+        adj[1, 258] = 0
+        npt.assert_array_equal(cache.distances(adj), floyd_warshall(adj))
+        self.assertEqual(cache.distances(adj)[0, 258], 2.0)
+        npt.assert_array_equal(bfs_distances(adj > 0.5, [0]), floyd_warshall(adj)[[0]])
+
     @parameterized.expand([
             (GRAPH_1_FW, GRAPH_1_EDG, W, X, [(W, X)]),
             (GRAPH_1_FW, GRAPH_1_EDG, X, W, []),
@@ -87,6 +137,11 @@ class TestMAGSeaparator(unittest.TestCase):
     def test_trace_fw_dist(self, fwdist, adj, u, v, edges):
         self.assertEqual(set(trace_f_w(fwdist, adj, u, v)), set(edges))
 
+    def test_ancestor_edge_index_union(self):
+        index = AncestorEdgeIndex(GRAPH_3_FW, GRAPH_3_EDG)
+        expected = set(trace_f_w(GRAPH_3_FW, GRAPH_3_EDG, X, Q)) | set(trace_f_w(GRAPH_3_FW, GRAPH_3_EDG, Y, W))
+        self.assertEqual(set(index.edges([X, Y], [Q, W])), expected | set(trace_f_w(GRAPH_3_FW, GRAPH_3_EDG, X, W)))
+
     @parameterized.expand([
         (GRAPH_1_EDG, GRAPH_1_BIEDG, GRAPH_1_FW, []),
         (GRAPH_2_EDG, GRAPH_2_BIEDG, GRAPH_2_FW, [([(Y, X), (W, Q)], [(X, W), (Y, W), (Y, Q)])]),
@@ -99,6 +154,17 @@ class TestMAGSeaparator(unittest.TestCase):
         paths = set((frozenset(edges), frozenset(frozenset({u, v}) for u, v in biedges)) for edges, biedges in paths)
         self.assertEqual(result, paths)
 
+    def test_inducing_paths_limits(self):
+        # a bidirected path 0 <-> 1 <-> 2 <-> 3 <-> 4 where every vertex is an ancestor of 0
+        adj = matrix_from_edges([(1, 0), (2, 0), (3, 0)], 5)
+        adjbi = matrix_from_edges([(0, 1), (1, 2), (2, 3), (3, 4)], 5, bidirect=True)
+        fwdist = floyd_warshall(adj)
+        lengths = [len(path) for path in inducing_paths(fwdist, adjbi, shortest_first=True)]
+        self.assertEqual(lengths, sorted(lengths))
+        self.assertEqual(set(lengths), {3, 4, 5})
+        self.assertEqual({len(path) for path in inducing_paths(fwdist, adjbi, max_length=2)}, {3})
+        self.assertEqual(len(check_for_inducing_path(adj, adjbi, fwdist, max_paths=2)), 2)
+
     @parameterized.expand([
         (GRAPH_1_EDG, GRAPH_1_BIEDG, GRAPH_1_FW, []),
         (GRAPH_2_EDG, GRAPH_2_BIEDG, GRAPH_2_FW, []),
@@ -110,6 +176,21 @@ class TestMAGSeaparator(unittest.TestCase):
         cycles = set((frozenset(edges), frozenset(frozenset({u, v}) for u, v in biedges)) for edges, biedges in cycles)
         self.assertEqual(result, cycles)
 
+    def test_separate_fractional_cycles(self):
+        x = np.zeros((4, 4))
+        x[0, 1] = x[1, 2] = x[2, 0] = 0.8
+        x[2, 3] = 0.9
+        xbi = np.zeros((4, 4))
+        xbi[0, 3] = xbi[3, 0] = 0.7
+        cycle_cuts, almost_directed_cuts = separate_fractional_cycles(x, xbi)
+        self.assertEqual({frozenset(edges) for edges in cycle_cuts}, {frozenset({(0, 1), (1, 2), (2, 0)})})
+        # 0 -> 1 -> 2 -> 3 has weight 0.5 and the bidirected edge adds 0.3
+        self.assertEqual([(set(edges), biedges) for edges, biedges in almost_directed_cuts],
+                         [({(0, 1), (1, 2), (2, 3)}, [(0, 3)])])
+
+        cycle_cuts, almost_directed_cuts = separate_fractional_cycles(x * 0.5, xbi)
+        self.assertEqual((cycle_cuts, almost_directed_cuts), ([], []))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+import igraph as ig
+import numpy as np
+import numpy.testing as npt
+import scipy.sparse as sp
+
+import notears.utils as utils
+
+
+class TestTopologicalOrder(unittest.TestCase):
+
+    def test_matches_igraph(self):
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            d = int(rng.integers(1, 20))
+            W = rng.normal(size=(d, d)) * (rng.random((d, d)) < rng.random() * 4 / d)
+            if rng.random() < 0.7:
+                permutation = rng.permutation(d)
+                W = np.triu(W, 1)[np.ix_(permutation, permutation)]
+            graph = ig.Graph.Weighted_Adjacency(W.tolist())
+            self.assertEqual(utils.is_dag(W), graph.is_dag())
+            self.assertEqual(utils.is_dag(sp.csr_matrix(W)), graph.is_dag())
+            if graph.is_dag():
+                # the same order as igraph, so that the simulations draw the same data
+                npt.assert_array_equal(utils.topological_order(W), graph.topological_sorting())
+                npt.assert_array_equal(utils.topological_order(sp.csc_matrix(W)), graph.topological_sorting())
+
+    def test_cycles(self):
+        self.assertIsNone(utils.topological_order(np.array([[1.0]])))
+        self.assertFalse(utils.is_dag(np.array([[0, 1, 0], [0, 0, 1], [1, 0, 0]])))
+        # explicitly stored zeros are not edges
+        W = sp.csr_matrix((np.array([0.0, 1.0]), (np.array([0, 1]), np.array([1, 0]))), shape=(2, 2))
+        npt.assert_array_equal(utils.topological_order(W), [1, 0])
+
+
+class TestSimulateLinearSemBatch(unittest.TestCase):
+
+    def setUp(self):
+        utils.set_random_seed(0)
+        self.W = utils.simulate_parameter(utils.simulate_dag(6, 8, 'ER'))
+
+    def test_covariance(self):
+        X = utils.simulate_linear_sem_batch(self.W, 5000, 'gauss', 4, noise_scale=0.5, seed=0)
+        self.assertEqual(X.shape, (4, 5000, 6))
+        inverse = np.linalg.inv(np.eye(6) - self.W)
+        covariance = 0.25 * inverse.T @ inverse
+        for X_r in X:
+            npt.assert_allclose(np.cov(X_r.T), covariance, atol=0.1 * np.abs(covariance).max())
+        self.assertFalse(np.allclose(X[0], X[1]))
+
+    def test_reproducible_replicates(self):
+        for sem_type in ('gauss', 'exp', 'gumbel', 'uniform', 'logistic', 'poisson'):
+            W = self.W / 4 if sem_type == 'poisson' else self.W
+            X = utils.simulate_linear_sem_batch(W, 50, sem_type, 3, seed=[1, 2, 3])
+            npt.assert_array_equal(X[1], utils.simulate_linear_sem_batch(W, 50, sem_type, 1, seed=[2])[0])
+            npt.assert_array_equal(X, utils.simulate_linear_sem_batch(W, 50, sem_type, 3, seed=[1, 2, 3]))
+        X = utils.simulate_linear_sem_batch(self.W, 50, 'logistic', 2, seed=0)
+        self.assertTrue(np.isin(X, [0, 1]).all())
+
+    def test_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'X.npy')
+            X = utils.simulate_linear_sem_batch(self.W, 100, 'gauss', 3, seed=5, path=path)
+            npt.assert_array_equal(np.load(path), utils.simulate_linear_sem_batch(self.W, 100, 'gauss', 3, seed=5))
+            del X
+
+    def test_not_dag(self):
+        with self.assertRaises(ValueError):
+            utils.simulate_linear_sem_batch(np.array([[0, 1.0], [1.0, 0]]), 10, 'gauss', 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
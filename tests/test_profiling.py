@@ -0,0 +1,55 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from dagsolvers.profiling import CUT_KINDS, merge_records, write_json
+from dagsolvers.solve_exmag import solve
+import notears.utils as utils
+
+
+class TestProfiling(unittest.TestCase):
+
+    def solve_profiled(self, **kwargs):
+        utils.set_random_seed(0)
+        B_true = utils.simulate_dag(6, 8, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), 500, 'gauss')
+        tabu_edges = [(i, j) for i in range(6) for j in range(i) if B_true[i, j] == 0 and B_true[j, i] == 0]
+        with contextlib.redirect_stdout(io.StringIO()):
+            return solve(X, 0.05, 'l2', 'l1', 0.1, tabu_edges=tabu_edges, mode='all_cycles', warm_start=False,
+                         profile=True, **kwargs)
+
+    def test_record(self):
+        W, Wbi, gap, lazy_count, stats, record = self.solve_profiled()
+        self.assertEqual(record['lazy_constraints'], lazy_count)
+        self.assertEqual(record['gap'], gap)
+        self.assertEqual(set(record['cuts']), set(CUT_KINDS))
+        found = sum(cut['count'] for cut in record['cuts'].values())
+        self.assertEqual(found, lazy_count + record['suppressed_cuts'])
+        mipsol = record['callbacks']['mipsol']
+        for stage in ('get_solution', 'cycles', 'reachability', 'inducing_paths', 'add_cuts'):
+            self.assertEqual(record['stages'][stage]['calls'], mipsol['calls'])
+        self.assertLessEqual(sum(stage['time'] for stage in record['stages'].values()), record['callback_time'])
+        self.assertAlmostEqual(record['gurobi_time'] + record['callback_time'], record['runtime'])
+        self.assertTrue(record['trajectory'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'profile.json')
+            write_json(record, path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['cuts'], record['cuts'])
+
+    def test_merge_records(self):
+        record = self.solve_profiled(decompose=False)[-1]
+        merged = merge_records([record, record])
+        self.assertEqual(merged['lazy_constraints'], 2 * record['lazy_constraints'])
+        self.assertEqual(merged['stages']['cycles']['calls'], 2 * record['stages']['cycles']['calls'])
+        self.assertEqual(len(merged['trajectory']), 2 * len(record['trajectory']))
+        self.assertAlmostEqual(merged['trajectory'][len(record['trajectory'])][0],
+                               record['runtime'] + record['trajectory'][0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
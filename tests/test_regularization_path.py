@@ -0,0 +1,25 @@
+import unittest
+
+import numpy as np
+
+from dagsolvers.regularization_path import solve_path
+import notears.utils as utils
+
+
+class TestRegularizationPath(unittest.TestCase):
+
+    def test_solve_path(self):
+        utils.set_random_seed(0)
+        B_true = utils.simulate_dag(5, 8, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), 100, 'gauss')
+        lambdas = [1.0, 0.01, 0.1]
+        path = solve_path(X, lambdas, 'l2', 'l1', 0, tabu_edges=[(0, 1)])
+        self.assertEqual(len(path), len(lambdas))
+        for W, _, _, _, _ in path:
+            self.assertTrue(utils.is_dag(W))
+        # a larger penalty does not select more edges
+        self.assertLessEqual(np.count_nonzero(path[0][0]), np.count_nonzero(path[1][0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import contextlib
+import io
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from dagsolvers.reweighting import l1_objective, resolve
+from dagsolvers.solve_exmag import build_model, l2_loss_from_gram, solve
+from dagsolvers.sufficient_statistics import weighted_gram
+import notears.utils as utils
+
+
+class NamedArray(np.ndarray):
+    """Array with the column names of a data frame, which np.asarray drops."""
+
+
+def named_data(X, columns):
+    X = X.view(NamedArray)
+    X.columns = columns
+    return X
+
+
+class TestReweighting(unittest.TestCase):
+
+    def test_weighted_loss_from_gram(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(30, 4))
+        sample_weights = rng.uniform(0.5, 2.0, size=(30, 4))
+        W = np.triu(rng.normal(size=(4, 4)), 1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            m = build_model(X, 0.1, 'l2', 'l1', mode='all_cycles')
+        loss = l2_loss_from_gram(weighted_gram(X, sample_weights), m._edges_weights, 4)
+        m.setObjective(loss)
+        m._edges_weights.LB = m._edges_weights.UB = W
+        m.optimize()
+        self.assertAlmostEqual(m.ObjVal, np.sum(sample_weights * (X - X @ W) ** 2), places=6)
+        m.dispose()
+
+    def test_resolve_keeps_pooled_cuts(self):
+        utils.set_random_seed(0)
+        X = utils.simulate_linear_sem(utils.simulate_parameter(utils.simulate_dag(8, 12, 'ER')), 200, 'gauss')
+        with contextlib.redirect_stdout(io.StringIO()):
+            m = build_model(X, 0.1, 'l2', 'l1')
+            lazy_counts = []
+            for iteration in range(3):
+                resolve(m, weighted_gram(X, np.ones(200)), 200, warm_start=iteration > 0)
+                lazy_counts.append(m._lazy_count)
+        # the same problem again needs few new cuts, if any
+        self.assertLessEqual(lazy_counts[1], lazy_counts[0])
+        self.assertLess(lazy_counts[2], lazy_counts[0])
+        m.dispose()
+
+    def test_irls_close_to_exact_l1(self):
+        utils.set_random_seed(1)
+        B_true = utils.simulate_dag(5, 5, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), 100, 'gumbel')
+        results = {}
+        for l1_method in ('exact', 'irls'):
+            with contextlib.redirect_stdout(io.StringIO()):
+                W, Wbi, *_ = solve(X, 1.0, 'l1', 'l1', 0.0, l1_method=l1_method, mode='all_cycles')
+            self.assertTrue(utils.is_dag(W))
+            results[l1_method] = l1_objective(X, W + Wbi, W != 0, Wbi != 0, 1.0, 'l1')
+        # the exact model is solved to a 10% MIP gap
+        self.assertLess(results['irls'], 1.15 * results['exact'])
+
+    def test_l1_approximations_with_column_names(self):
+        utils.set_random_seed(0)
+        B_true = utils.simulate_dag(4, 3, 'ER')
+        X = named_data(utils.simulate_linear_sem(utils.simulate_parameter(B_true), 200, 'gauss'), ['a', 'b', 'c', 'd'])
+        for l1_method in ('sample', 'irls'):
+            with contextlib.redirect_stdout(io.StringIO()):
+                W, Wbi, *_ = solve(X, 1.0, 'l1', 'l1', 0.0, tabu_edges=[('a', 'b')], forbidden_edges=[('c', 'd')],
+                                   l1_method=l1_method, l1_sample_size=100, mode='all_cycles')
+            self.assertEqual(W[0, 1], 0)
+            self.assertEqual(W[1, 0], 0)
+            self.assertEqual(W[2, 3] + W[3, 2] + Wbi[2, 3] + Wbi[3, 2], 0)
+
+    def test_irls_rejects_data_weights_bound(self):
+        X = np.random.default_rng(0).normal(size=(30, 4))
+        with self.assertRaises(AssertionError):
+            solve(X, 1.0, 'l1', 'l1', 0.0, l1_method='irls', data_weights_bound=True)
+
+    def test_sample(self):
+        utils.set_random_seed(0)
+        B_true = utils.simulate_dag(4, 3, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), 2000, 'gauss')
+        with contextlib.redirect_stdout(io.StringIO()):
+            W, Wbi, *_ = solve(X, 5.0, 'l1', 'l1', 0.3, l1_method='sample', l1_sample_size=100, mode='all_cycles')
+        npt.assert_array_equal((W != 0) | (W.T != 0), (B_true != 0) | (B_true.T != 0))
+
+    def test_trimmed_ignores_outliers(self):
+        utils.set_random_seed(0)
+        B_true = utils.simulate_dag(5, 5, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B_true), 500, 'gauss')
+        outliers = np.random.choice(500, size=25, replace=False)
+        X[outliers] = np.random.normal(scale=20.0, size=(25, 5))
+        with contextlib.redirect_stdout(io.StringIO()):
+            W, Wbi, *_ = solve(X, 10.0, 'l2', 'l1', 0.3, robust='trimmed', robust_fraction=0.9, mode='all_cycles')
+        self.assertTrue(utils.is_dag(W))
+        npt.assert_array_equal((W != 0) | (W.T != 0), (B_true != 0) | (B_true.T != 0))
+
+    def test_trimmed_with_column_names(self):
+        utils.set_random_seed(0)
+        B_true = utils.simulate_dag(4, 3, 'ER')
+        X = named_data(utils.simulate_linear_sem(utils.simulate_parameter(B_true), 200, 'gauss'), ['a', 'b', 'c', 'd'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            W, Wbi, *_ = solve(X, 1.0, 'l2', 'l1', 0.0, robust='trimmed', tabu_edges=[('a', 'b')],
+                               forbidden_edges=[('c', 'd')], mode='all_cycles')
+        self.assertEqual(W[0, 1], 0)
+        self.assertEqual(W[1, 0], 0)
+        self.assertEqual(W[2, 3] + W[3, 2] + Wbi[2, 3] + Wbi[3, 2], 0)
+
+    def test_trimmed_rejects_data_weights_bound(self):
+        X = np.random.default_rng(0).normal(size=(30, 4))
+        with self.assertRaises(AssertionError):
+            solve(X, 1.0, 'l2', 'l1', 0.0, robust='trimmed', data_weights_bound=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
+import contextlib
+import io
 import unittest
 
 import numpy as np
 import numpy.testing as npt
 
 from dagsolvers.solve_exmag import *
+from dagsolvers.dagsolver_utils import least_square_cost
+import notears.utils as utils
 
 
 def normalize_data(X):
@@ -14,21 +18,23 @@ def normalize_data(X):
     return X
 
 
+TOY_X = np.array([[0.0203909, 0.04775229],
+                  [0.25638959, 0.50334587],
+                  [0.20186161, 0.40688697],
+                  [0.42097784, 0.83867313],
+                  [0.56834260, 1.13922780],
+                  [0.04024122, 0.09041621],
+                  [0.42283032, 0.84356574],
+                  [0.67292356, 1.34925317],
+                  [0.16439640, 0.30947817],
+                  [0.81765796, 1.62457809]])
+
+
 class TestRun(unittest.TestCase):
 
     def test_default(self):
         tabu_edges = [(0, 1)]
-        X = np.array([[0.0203909, 0.04775229],
-                     [0.25638959, 0.50334587],
-                     [0.20186161, 0.40688697],
-                     [0.42097784, 0.83867313],
-                     [0.56834260, 1.13922780],
-                     [0.04024122, 0.09041621],
-                     [0.42283032, 0.84356574],
-                     [0.67292356, 1.34925317],
-                     [0.16439640, 0.30947817],
-                     [0.81765796, 1.62457809]])
-        X = normalize_data(X)
+        X = normalize_data(TOY_X)
 
         # W_est, A_est, _, _, stats = solve(X, cfg, 0, Y=Y, B_ref=None)
         W_est, W_bi, _, _, stats = solve(X, lambda1=1, loss_type='l2', reg_type='l1', w_threshold=0,
@@ -37,6 +43,155 @@ class TestRun(unittest.TestCase):
         print(W_est)
         print(W_bi)
 
+    def test_positional_arguments(self):
+        X = normalize_data(TOY_X)
+        W_est, W_bi, _, _, _ = solve(X, 1, 'l2', 'l1', 0, [(0, 1)], None, 'all_cycles')
+        self.assertEqual(W_est[0, 1], 0)
+        self.assertEqual(W_est[1, 0], 0)
+        with self.assertRaises(TypeError):
+            solve(X, 1, 'l2', 'l1', 0, [(0, 1)], None, 'all_cycles', 300, False, 100.0, 'weights', False)
+
+    def test_l2_loss_from_gram_matches_expansion(self):
+        X = normalize_data(TOY_X)
+        n, d = X.shape
+        W = np.array([[0.0, 0.7],
+                      [-0.3, 0.0]])
+        m = gp.Model()
+        m.Params.OutputFlag = 0
+        edges_weights = m.addMVar((d, d), lb=W, ub=W)
+        expanded = gp.quicksum((X[i, j] - gp.quicksum(X[i, k] * edges_weights[k, j].item() for k in range(d) if k != j))
+                               ** 2 for i in range(n) for j in range(d))
+        from_gram = l2_loss_from_gram(X.T @ X, edges_weights, d)
+        m.setObjective(from_gram)
+        m.optimize()
+        self.assertAlmostEqual(expanded.getValue(), m.ObjVal)
+        self.assertAlmostEqual(least_square_cost(X, W), m.ObjVal)
+        m.dispose()
+
+    def test_build_model_objective_matches_least_squares(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(50, 4))
+        n, d = X.shape
+        W = np.triu(rng.normal(size=(d, d)), 1)
+        for reg_type, reg in (('l1', np.count_nonzero(W)), ('l2', np.sum(W ** 2))):
+            m = build_model(X, 0.5, 'l2', reg_type, compact_bidirected=False, warm_start=False)
+            m.Params.OutputFlag = 0
+            m._edges_vars.lb = m._edges_vars.ub = W != 0
+            m._biedges_vars.ub = 0
+            m._edges_weights.lb = m._edges_weights.ub = W
+            m.optimize()
+            self.assertAlmostEqual(m.ObjVal, least_square_cost(X, W) / n + 0.5 / d * reg)
+            m.dispose()
+
+    def test_find_cycles(self):
+        # two triangles 0 -> 1 -> 2 -> 0 and 2 -> 3 -> 4 -> 2 sharing vertex 2, plus a chord 0 -> 2
+        adj = np.zeros((5, 5))
+        for i, j in [(0, 1), (1, 2), (2, 0), (2, 3), (3, 4), (4, 2), (0, 2)]:
+            adj[i, j] = 1
+
+        def cycle_edges(cycle):
+            return {(cycle[i + 1], cycle[i]) for i in range(len(cycle) - 1)} | {(cycle[0], cycle[-1])}
+
+        shortest = find_cycles(adj, 'shortest_cycle')
+        self.assertEqual(len(shortest), 1)
+        self.assertLessEqual(len(shortest[0]), 3)
+        for cycle in find_cycles(adj, 'all_cycles'):
+            self.assertTrue(all(adj[e] for e in cycle_edges(cycle)))
+        disjoint = find_cycles(adj, 'disjoint_cycles')
+        self.assertEqual({frozenset(cycle_edges(cycle)) for cycle in disjoint},
+                         {frozenset({(0, 2), (2, 0)}), frozenset({(2, 3), (3, 4), (4, 2)})})
+        self.assertEqual(len(find_cycles(adj, 'disjoint_cycles', max_cycles=1)), 1)
+        self.assertEqual(find_cycles(np.triu(adj, 1), 'all_cycles'), [])
+
+    def test_add_mag_variables_masks(self):
+        tabu_matrix = np.array([[0, 1, 0],
+                                [1, 0, 0],
+                                [0, 0, 0]])
+        m = gp.Model()
+        edges_vars, biedges_vars, edges_weights = add_mag_variables(m, 3, tabu_matrix)
+        m.update()
+        npt.assert_array_equal(edges_vars.ub, [[0, 0, 1], [0, 0, 1], [1, 1, 0]])
+        npt.assert_array_equal(biedges_vars.ub, [[0, 1, 0], [1, 0, 0], [0, 0, 0]])
+        npt.assert_array_equal(np.diag(edges_weights.ub), np.zeros(3))
+        # anti-parallel constraints only for the pairs (0, 2) and (1, 2), symmetry only for (0, 1)
+        self.assertEqual(m.NumConstrs, 2 * 6 + 2 + 1)
+        m.dispose()
+
+    def test_candidates_prune_model(self):
+        tabu_matrix = np.array([[0, 1, 0],
+                                [1, 0, 0],
+                                [0, 0, 0]])
+        candidates = np.array([[0, 0, 1],
+                               [1, 0, 0],
+                               [0, 0, 0]], dtype=bool)
+        m = gp.Model()
+        edges_vars, biedges_vars, edges_weights = add_mag_variables(m, 3, tabu_matrix, candidates=candidates)
+        m.update()
+        npt.assert_array_equal(edges_vars.ub, [[0, 0, 1], [0, 0, 0], [0, 0, 0]])
+        npt.assert_array_equal(biedges_vars.ub, [[0, 1, 0], [1, 0, 0], [0, 0, 0]])
+        npt.assert_array_equal(edges_weights.ub != 0, [[0, 1, 1], [1, 0, 0], [0, 0, 0]])
+        self.assertEqual(m.NumConstrs, 2 * 3 + 1)
+        m.dispose()
+
+    def test_compact_bidirected(self):
+        tabu_matrix = np.array([[0, 1, 1],
+                                [1, 0, 0],
+                                [1, 0, 0]])
+        m = gp.Model()
+        edges_vars, biedges_vars, edges_weights = add_mag_variables(m, 3, tabu_matrix, compact_bidirected=True)
+        m.update()
+        self.assertEqual(len(biedges_vars), 2)
+        npt.assert_array_equal(biedges_vars.ub, tabu_matrix)
+        self.assertTrue(biedges_vars[0, 2].item().sameAs(biedges_vars[2, 0].item()))
+        self.assertEqual(m.NumConstrs, 2 * 6 + 1)
+        m.dispose()
+
+        utils.set_random_seed(1)
+        B = np.zeros((5, 5))
+        for i, j in [(0, 1), (0, 2), (2, 3), (3, 4), (1, 4)]:
+            B[i, j] = 1
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B), 200, 'gauss')[:, 1:]
+        objectives = []
+        for compact_bidirected in (False, True):
+            m = build_model(X, 0.1, 'l2', 'l1', tabu_edges=[(0, 1), (1, 2)], mode='all_cycles',
+                            compact_bidirected=compact_bidirected)
+            m.Params.MIPGap = 1e-6
+            optimize_model(m)
+            objectives.append(m.ObjVal)
+            W, Wbi = extract_solution(m, 0)
+            npt.assert_array_equal(Wbi != 0, (Wbi != 0).T)
+            m.dispose()
+        self.assertAlmostEqual(objectives[0], objectives[1], places=6)
+
+    def test_decomposition(self):
+        utils.set_random_seed(0)
+        B = np.zeros((6, 6))
+        for i, j in [(0, 1), (1, 2), (3, 4), (4, 5), (3, 5)]:
+            B[i, j] = 1
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B), 200, 'gauss')
+        forbidden_edges = [(i, j) for i in range(3) for j in range(3, 6)]
+        components = allowed_components(candidates_matrix(X, forbidden_edges))
+        self.assertEqual([c.tolist() for c in components], [[0, 1, 2], [3, 4, 5]])
+
+        options = {'tabu_edges': [(0, 2)], 'forbidden_edges': forbidden_edges, 'mode': 'all_cycles'}
+        W, Wbi, _, _, _ = solve(X, 0.1, 'l2', 'l1', 0, decompose=False, **options)
+        W_dec, Wbi_dec, _, _, _, component_results = solve_components(X, components, 0.1, 'l2', 'l1', 0, workers=2,
+                                                                      parallel_min_size=3, **options)
+        self.assertEqual(len(component_results), 2)
+        npt.assert_array_equal(W_dec != 0, W != 0)
+        npt.assert_array_equal(Wbi_dec != 0, Wbi != 0)
+        self.assertTrue(np.all(W_dec[np.ix_(range(3), range(3, 6))] == 0))
+
+    def test_forbidden_edges_reported(self):
+        X = np.random.default_rng(0).normal(size=(50, 6))
+        candidates = candidates_matrix(X, [(0, 1)])
+        self.assertFalse(candidates.diagonal().any())
+        self.assertEqual(candidates.sum(), 6 * 5 - 2)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            build_model(X, 0.1, 'l2', 'l1', forbidden_edges=[(0, 1)], warm_start=False).dispose()
+        self.assertIn('Candidate super-structure: 28 of 30 directed', output.getvalue())
+
 
 if __name__ == '__main__':
     unittest.main()
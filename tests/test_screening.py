@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from dagsolvers.screening import candidate_parents, partial_correlations, weight_bounds
+import notears.utils as utils
+
+
+class TestScreening(unittest.TestCase):
+
+    def test_partial_correlations_of_chain(self):
+        utils.set_random_seed(0)
+        W = np.zeros((3, 3))
+        W[0, 1] = W[1, 2] = 1.0
+        X = utils.simulate_linear_sem(W, 20000, 'gauss')
+        scores = partial_correlations(X.T @ X)
+        # 0 and 2 are independent given 1
+        self.assertLess(scores[0, 2], 0.05)
+        self.assertGreater(scores[0, 1], 0.4)
+        npt.assert_array_equal(np.diag(scores), np.zeros(3))
+
+    def test_candidate_parents(self):
+        utils.set_random_seed(0)
+        B = utils.simulate_dag(8, 8, 'ER')
+        X = utils.simulate_linear_sem(utils.simulate_parameter(B), 2000, 'gauss')
+        candidates = candidate_parents(X.T @ X, 'partial_correlation', k=3)
+        self.assertTrue((candidates.sum(axis=0) <= 3).all())
+        self.assertFalse(np.diag(candidates).any())
+        # the true parents are kept
+        self.assertTrue((candidates | candidates.T)[B != 0].all())
+        candidates = candidate_parents(X.T @ X, 'correlation', threshold=0.99)
+        self.assertFalse(candidates.any())
+
+    def test_weight_bounds_hold_for_least_squares(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(50, 6)) @ rng.normal(size=(6, 6))
+        gram = X.T @ X
+        bounds = weight_bounds(gram)
+        for _ in range(200):
+            j = rng.integers(6)
+            parents = [k for k in range(6) if k != j and rng.random() < 0.5]
+            if not parents:
+                continue
+            weights = np.linalg.solve(gram[np.ix_(parents, parents)], gram[parents, j])
+            self.assertTrue((np.abs(weights) <= bounds[parents, j] + 1e-9).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
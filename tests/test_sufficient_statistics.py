@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import numpy.testing as npt
+
+from dagsolvers.solve_exmag import solve
+from dagsolvers.sufficient_statistics import SufficientStatistics
+import notears.utils as utils
+
+
+class TestSufficientStatistics(unittest.TestCase):
+
+    def setUp(self):
+        utils.set_random_seed(0)
+        B = utils.simulate_dag(5, 6, 'ER')
+        self.X = utils.simulate_linear_sem(utils.simulate_parameter(B), 250, 'gauss')
+
+    def test_chunked_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            npy_path = os.path.join(directory, 'X.npy')
+            csv_path = os.path.join(directory, 'X.csv')
+            np.save(npy_path, self.X)
+            np.savetxt(csv_path, self.X, delimiter=',', header='a,b,c,d,e', comments='')
+            for statistics in (SufficientStatistics().add_npy(npy_path, chunk_rows=60),
+                               SufficientStatistics().add_csv(csv_path, chunk_rows=60, header=True)):
+                self.assertEqual(statistics.shape, self.X.shape)
+                npt.assert_allclose(statistics.gram, self.X.T @ self.X)
+                npt.assert_allclose(statistics.mean, self.X.mean(axis=0))
+            self.assertEqual(statistics.columns, ['a', 'b', 'c', 'd', 'e'])
+
+            centered = statistics.centered()
+            X_centered = self.X - self.X.mean(axis=0)
+            npt.assert_allclose(centered.gram, X_centered.T @ X_centered, atol=1e-8)
+
+            # append to saved statistics without reading the old data again
+            path = os.path.join(directory, 'statistics.npz')
+            SufficientStatistics().add_array(self.X[:100]).save(path)
+            statistics = SufficientStatistics.load(path).add_array(self.X[100:])
+            self.assertEqual(statistics.n, len(self.X))
+            npt.assert_allclose(statistics.gram, self.X.T @ self.X)
+
+    def test_solve_from_statistics(self):
+        options = {'tabu_edges': [(0, 1)], 'mode': 'all_cycles'}
+        W, Wbi, _, _, _ = solve(self.X, 0.1, 'l2', 'l1', 0.1, **options)
+        statistics = SufficientStatistics(5).add_array(self.X, chunk_rows=32)
+        W_statistics, Wbi_statistics, _, _, _ = solve(statistics, 0.1, 'l2', 'l1', 0.1, **options)
+        npt.assert_array_equal(W_statistics != 0, W != 0)
+        npt.assert_allclose(W_statistics, W, atol=1e-2)
+
+
+if __name__ == '__main__':
+    unittest.main()